@@ -0,0 +1,113 @@
+# Copyright 2017 Sascha Schweitzer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#    http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Speed benchmark: detection of pure subsets with conflicting supersets,
+# nested loops over the interrelated nodes (up to version 0.2a) vs. the
+# index of Components.pure_subset_conflict. Two kinds of synthetic blocks:
+# - prefix tree of initials ("A", "A B", "A C", "A B D", ...): each inner
+#   node is a pure subset with conflicting supersets as soon as its own
+#   prefix has been removed, so the block is peeled one node at a time.
+# - shared superset: many pure subsets with compatible supersets (chains
+#   below a common superset "T") that are scanned again after each removal
+#   of one of the conflicting pure subsets attached to "T".
+# Usage (from the repository root): PYTHONPATH=. python benchmarks/pure_subsets.py
+
+import time
+
+from persons.support_functions.relation_matrix import RelationMatrix
+from persons.support_functions.components import Components
+
+def prefix_tree_block(depth, branching):
+	''' Relation matrix of all paths of a tree (a path is a subset of the paths it is a prefix of)
+	'''
+	paths 			= [()]
+	for level in range(depth):
+		paths 		+= [ path + (branch,) for path in paths if len(path)==level for branch in range(branching) ]
+	matrix 			= RelationMatrix()
+	for path in paths:
+		matrix.add_node( { node: RelationMatrix.it_subset for node, other in enumerate(paths[:matrix.size]) if path[:len(other)]==other } )
+	return matrix
+
+def shared_superset_block(pure, chain, conflicts):
+	''' Relation matrix of pure subsets with chains of supersets below a common superset, and conflicting pure subsets of the common superset
+	'''
+	matrix 			= RelationMatrix()
+	pure_nodes 		= [ matrix.add_node() for node in range(pure) ]
+	below_top 		= list(pure_nodes)
+	for node in pure_nodes:
+		supersets 	= [node]
+		for level in range(chain):
+			supersets 	. append( matrix.add_node( { other: RelationMatrix.it_subset for other in supersets } ) )
+		below_top 	+= supersets[1:]
+	top 			= matrix.add_node( { other: RelationMatrix.it_subset for other in below_top } )
+	for conflict in range(conflicts):
+		node 		= matrix.add_node( { top: RelationMatrix.me_subset } )
+		matrix 		. add_node( { node: RelationMatrix.it_subset } )
+	return matrix
+
+def nested_loops(components, interrelated):
+	''' Detection as in the former version of _cluster
+	'''
+	matrix 					= components.matrix
+	pure_subset_removed 	= False
+	item_to_remove 			= None
+	for item in interrelated:
+		if RelationMatrix.it_subset not in components.row(item).values() and RelationMatrix.crossed not in components.row(item).values() and not pure_subset_removed:
+			for first in interrelated:
+				if matrix.get(item, first)==RelationMatrix.me_subset and not pure_subset_removed:
+					for second in interrelated:
+						if matrix.get(item, second)==RelationMatrix.me_subset and not pure_subset_removed:
+							if matrix.get(first, second)==RelationMatrix.different:
+								pure_subset_removed 	= True
+								item_to_remove 			= item
+	return item_to_remove
+
+def indexed(components, interrelated):
+	return components.pure_subset_conflict(interrelated)[0]
+
+def peel(matrix, detector):
+	''' Remove pure subsets with conflicting supersets from the block (as _cluster_block does). Returns the removed nodes in order.
+	'''
+	components 				= Components(matrix)
+	queue 					= components.queue( range(len(matrix)) )
+	removed 				= []
+	while len(queue)>0:
+		interrelated 		= components.pop_component(queue, [RelationMatrix.me_subset, RelationMatrix.it_subset])
+		item 				= detector(components, interrelated)
+		if item is not None:
+			interrelated 	. remove(item)
+			components 		. isolate(item)
+			components 		. extend(queue, interrelated)
+			removed 		. append(item)
+	return removed
+
+def measure(detector, block, parameters):
+	matrix 					= block(*parameters)
+	start 					= time.perf_counter()
+	removed 				= peel(matrix, detector)
+	return time.perf_counter()-start, removed
+
+print("{:>16} {:>14} {:>8} {:>8} {:>12} {:>12}".format("block", "parameters", "nodes", "removed", "nested (s)", "indexed (s)"))
+# Blocks and whether to run the nested loops (they take minutes for the largest shared superset block)
+for block, parameters, nested in [	(prefix_tree_block, (6, 2), True), (prefix_tree_block, (10, 2), True), (prefix_tree_block, (6, 4), True),
+									(shared_superset_block, (20, 3, 20), True), (shared_superset_block, (50, 5, 50), True), (shared_superset_block, (200, 5, 200), False) ]:
+	nodes 					= len(block(*parameters))
+	indexed_time, removed 	= measure(indexed, block, parameters)
+	if nested:
+		nested_time, nested_removed 	= measure(nested_loops, block, parameters)
+		assert nested_removed==removed
+		nested_time 		= "{:.3f}".format(nested_time)
+	else:
+		nested_time 		= "-"
+	print("{:>16} {:>14} {:>8} {:>8} {:>12} {:>12.3f}".format(block.__name__.replace("_block", ""), str(parameters).replace(" ", ""), nodes, len(removed), nested_time, indexed_time))
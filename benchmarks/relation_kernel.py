@@ -0,0 +1,64 @@
+# Copyright 2017 Sascha Schweitzer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#    http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Time benchmark: relation pass of one surname block (comparison of each
+# distinct forename with the previous ones) with the python backend vs. the
+# numpy backend (private parameter '_relation_backend', requires numpy).
+# Usage (from the repository root): PYTHONPATH=. python benchmarks/relation_kernel.py
+
+import random
+import time
+
+import numpy 		# Imported before the measurement (required by the numpy backend)
+
+from persons.persons import Persons
+from persons.support_functions.relation_kernel import kernel_minimum_size
+
+FORENAMES 		= ["john", "james", "jason", "jean", "joseph", "julia", "maria", "mark", "michael", "anna", "albert", "paul", "peter"]
+
+def random_forenames(count, seed=0):
+	''' Distinct forenames of one to three tokens (full names or initials)
+	'''
+	generator 		= random.Random(seed)
+	forenames 		= []
+	seen 			= set()
+	while len(forenames)<count:
+		tokens 		= [ generator.choice(FORENAMES) for i in range(generator.choice([1, 2, 2, 3])) ]
+		forename 	= " ".join( token if generator.random()<0.6 else token[0] for token in tokens )
+		if forename not in seen:
+			seen 	. add(forename)
+			forenames.append(forename)
+	return forenames
+
+def relation_pass(forenames, backend):
+	''' Relations of the nodes (as lists of codes) and the time of the relation pass
+	'''
+	persons 					= Persons()
+	persons._relation_backend 	= backend
+	persons 					. _update_relation_options()
+	block 						= persons._new_surname_block()
+	block["pending"] 			= { forename: [index] for index, forename in enumerate(forenames) }
+	block["node_by_record"] 	= [None]*len(forenames)
+	start 						= time.perf_counter()
+	persons 					. _add_nodes(block, persons._first_initial_blocking(), persons._vectorized_relations())
+	seconds 					= time.perf_counter() - start
+	return [ block["matrix"].row(node) for node in range(len(block["matrix"])) ], seconds
+
+print("{:>8} {:>12} {:>12}".format("nodes", "python (s)", "numpy (s)"))
+for count in [kernel_minimum_size, 300, 1000, 3000]:
+	forenames 					= random_forenames(count)
+	rows_python, python_time 	= relation_pass(forenames, "python")
+	rows_numpy, numpy_time 		= relation_pass(forenames, "numpy")
+	assert rows_python==rows_numpy
+	print("{:>8} {:>12.3f} {:>12.3f}".format(count, python_time, numpy_time))
@@ -0,0 +1,71 @@
+# Copyright 2017 Sascha Schweitzer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#    http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Memory benchmark: relations of a surname block stored as dense list of
+# lists (layout up to version 0.2a) vs. RelationMatrix (sparse upper
+# triangle with small integer codes).
+# Usage (from the repository root): PYTHONPATH=. python benchmarks/relation_storage.py
+
+import random
+import tracemalloc
+
+from persons.support_functions.relation_matrix import RelationMatrix
+
+def random_relations(size, density, seed=0):
+	''' Relations of each node to the previous nodes that are not "different" {node: code}
+	'''
+	generator 		= random.Random(seed)
+	codes 			= [RelationMatrix.it_subset, RelationMatrix.me_subset, RelationMatrix.crossed]
+	relations 		= []
+	for node in range(size):
+		count 		= min(node, int(generator.expovariate(1/(density*size))) if node>0 else 0)
+		relations.append( { other: generator.choice(codes) for other in generator.sample(range(node), count) } )
+	return relations
+
+def dense_layout(relations):
+	''' Matrix as built by the former version of _make_flat_tree
+	'''
+	names 			= {RelationMatrix.it_subset: 1, RelationMatrix.me_subset: -1, RelationMatrix.crossed: "crossed"}
+	flip 			= {1: -1, -1: 1, "crossed": "crossed", "different": "different"}
+	matrix 			= []
+	for node in range(len(relations)):
+		matrix.append( [ names[relations[node][other]] if other in relations[node] else "different" for other in range(node) ] + ["identical"] )
+		for other in range(node):
+			matrix[other].append( flip[matrix[-1][other]] )
+	return matrix
+
+def compact_layout(relations):
+	matrix 			= RelationMatrix()
+	for node in range(len(relations)):
+		matrix.add_node(relations[node])
+	return matrix
+
+def measure(function, relations):
+	tracemalloc.start()
+	result 			= function(relations)
+	size 			= tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	del result
+	return size
+
+print("{:>8} {:>10} {:>16} {:>16} {:>8}".format("nodes", "density", "dense (MB)", "compact (MB)", "ratio"))
+for size in [100, 1000, 5000]:
+	for density in [0.001, 0.01, 0.1]:
+		relations 	= random_relations(size, density)
+		dense 		= measure(dense_layout, relations)
+		compact 	= measure(compact_layout, relations)
+		print("{:>8} {:>10} {:>16.2f} {:>16.2f} {:>8.1f}".format(size, density, dense/2**20, compact/2**20, dense/compact))
+
+# The dense layout grows with the square of the block size (8 bytes per entry):
+# a block with 20,000 nodes requires at least 20000**2 * 8 bytes = 3 GB.
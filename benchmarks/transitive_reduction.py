@@ -0,0 +1,67 @@
+# Copyright 2017 Sascha Schweitzer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#    http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Speed benchmark: backends of Graph.transitive_reduction ("sets" vs.
+# "bitset") on subset graphs of n = 10, 50, 500 and 5000 nodes.
+# - tree: subsets of a prefix tree of initials ("A" < "A B" < "A B C"),
+#   sparse (each node is related to its prefixes and extensions only).
+# - chain: every node is a subset of all previous nodes, dense (n*(n-1)/2
+#   edges, all but n-1 of them are removed by the reduction).
+# Usage (from the repository root): PYTHONPATH=. python benchmarks/transitive_reduction.py
+
+import time
+
+from persons.support_functions.relation_matrix import RelationMatrix
+from persons.support_functions.graph_functions import Graph
+
+def tree_block(size, branching=3):
+	''' Relation matrix of the first 'size' paths of a tree (a path is a subset of the paths it is a prefix of)
+	'''
+	paths 			= [()]
+	while len(paths)<size:
+		paths 		+= [ path + (branch,) for path in paths if len(path)==len(paths[-1]) for branch in range(branching) ]
+	paths 			= paths[:size]
+	matrix 			= RelationMatrix()
+	for path in paths:
+		matrix.add_node( { node: RelationMatrix.it_subset for node, other in enumerate(paths[:matrix.size]) if path[:len(other)]==other } )
+	return matrix
+
+def chain_block(size):
+	''' Relation matrix of a chain (each node is a subset of all previous nodes)
+	'''
+	matrix 			= RelationMatrix()
+	for node in range(size):
+		matrix.add_node( dict.fromkeys(range(node), RelationMatrix.me_subset) )
+	return matrix
+
+def measure(matrix, backend):
+	graph 			= Graph(matrix, list(range(len(matrix))))
+	start 			= time.perf_counter()
+	graph 			. transitive_reduction(backend)
+	return time.perf_counter()-start, graph
+
+print("{:>8} {:>8} {:>12} {:>12} {:>12}".format("block", "nodes", "edges", "sets (s)", "bitset (s)"))
+for block in [tree_block, chain_block]:
+	for size in [10, 50, 500, 5000]:
+		matrix 						= block(size)
+		edges 						= sum( len(matrix.row(node)) for node in range(size) ) // 2
+		bitset_time, bitset_graph 	= measure(matrix, "bitset")
+		# The sets backend takes about a quarter of an hour for the largest chain
+		if edges<10**6:
+			sets_time, sets_graph 	= measure(matrix, "sets")
+			assert sets_graph.successors==bitset_graph.successors and sets_graph.predecessors==bitset_graph.predecessors
+			sets_time 				= "{:.4f}".format(sets_time)
+		else:
+			sets_time 				= "-"
+		print("{:>8} {:>8} {:>12} {:>12} {:>12.4f}".format(block.__name__.replace("_block", ""), size, edges, sets_time, bitset_time))
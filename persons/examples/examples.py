@@ -109,10 +109,50 @@ result = nm.persons_from_names( "sample_data/example_3.csv" , output_file="sampl
 print(result)
 
 ###
-# Example 4: xlsx file with IDs and year of entry (xlsx input requires the 'pandas' package)
+# Example 4: xlsx file with IDs and year of entry (xlsx input requires the 'pandas' and 'openpyxl' packages)
 print( "Example 4:")
-result = nm.persons_from_names( "sample_data/example_4.xlsx") 
+try:
+	import openpyxl
+except ImportError:
+	print("Skipped, requires 'openpyxl' for reading xlsx files.")
+else:
+	result = nm.persons_from_names( "sample_data/example_4.xlsx") 
+
+	# The function returns an OrderedDict with the results
+	print(result)
 
-# The function returns an OrderedDict with the results
-print(result)
 
+###
+# Example 5: query result of a database (sqlite3) with the person IDs written back to the table
+print( "Example 5:")
+import sqlite3
+# New instance with the default settings (match_interlaced was set in example 3b)
+nm_db 		= 	persons.Persons()
+# Rows fetched from the query and written back per transaction (small for
+# this example, so that the rows are fetched and written in several batches)
+nm_db._database_batch_size = 2
+connection 	= 	sqlite3.connect(":memory:")
+connection.execute("CREATE TABLE names (name_id INTEGER PRIMARY KEY, fnm TEXT, snm TEXT, year INTEGER, person INTEGER, matching TEXT)")
+connection.executemany("INSERT INTO names (name_id, fnm, snm, year) VALUES (?, ?, ?, ?)", [
+					(1, "Tim", "Burton", 1982),
+					(2, "Tim W.", "Burton", 1996),
+					(3, "Tim Walter", "Burton", 2012),
+					(4, "Tim J.V.", "Burton", 2007)
+				])
+# The rows of the query are fetched in batches, the statement given in
+# write_back is executed with (person_id, matching, id) for each name.
+# The query needs an ID column (the key column of the statement).
+result = nm_db.persons_from_names( (connection, "SELECT name_id, fnm, snm, year FROM names"),
+								write_back=(connection, "UPDATE names SET person=?, matching=? WHERE name_id=?") )
+
+# The function returns an OrderedDict with the results, the person IDs are saved in the table as well
+written_back = connection.execute("SELECT name_id, fnm, person, matching FROM names ORDER BY name_id").fetchall()
+print(written_back)
+
+# Each row of the table holds the person ID and kind of match of its name in the result
+assert written_back == [ (record["name_id"], record["fnm"], record["person_id"], record["matching"]) for record in sorted(result, key=lambda record: record["name_id"]) ]
+# "Tim W." and "Tim Walter" are the same person, "Tim" and "Tim J.V." are separate persons
+persons_by_name = { fnm: person for name_id, fnm, person, matching in written_back }
+assert persons_by_name["Tim W."] == persons_by_name["Tim Walter"]
+assert len(set(persons_by_name.values())) == 3
+assert [ matching for name_id, fnm, person, matching in written_back ] == ["equal", "vertical", "vertical", "equal"]
@@ -19,13 +19,24 @@ from datetime import datetime
 import re
 import sys
 import csv
+import gzip
 import copy
+import os
 
 import pytz
 
 # Helper packages included in this package
-from persons.support_functions.string_tools import * # functions: normalize(string), remove_particles(string)
+from persons.support_functions.string_tools import * # functions: normalize(string), normalize_cached(string), normalize_many(strings), remove_particles(string)
 from persons.support_functions.graph_functions import * # class: Graph, init with Graph(matrix), functions: transitive_reduction(self) - works only for transitive closure, get_single_strands(self)
+from persons.support_functions.relation_matrix import * # class: RelationMatrix, compact storage of the relations within a surname block
+from persons.support_functions.components import * # class: Components, connected components of the nodes of a surname block
+from persons.support_functions.relation_kernel import * # functions: vectorized_relations, numpy_available (optional numpy backend of the forename comparison)
+from persons.support_functions.token_table import * # class: TokenTable, integer IDs of forename tokens and their initials
+
+# Forename split into its parts (as token IDs), computed once per node of the tree (see Persons._forename_signature)
+ForenameSignature = collections.namedtuple("ForenameSignature", ["name", "id", "tokens", "initials", "parts", "length", "unordered"])
+# Order-independent form of a forename (for ignore_order_of_forenames): set of tokens, initials of the full names, initials occurring as initial and as initial of a full name
+UnorderedForename = collections.namedtuple("UnorderedForename", ["tokens", "full_initials", "mixed"])
 
 class Persons(object):
 	def __init__(self):
@@ -38,6 +49,7 @@ class Persons(object):
 		# Transformations of the input
 		self.remove_particles_suffixes 							= True
 		self.normalize_names 									= True
+		self.particles 											= list(default_particles) 	# Particles removed from surnames if remove_particles_suffixes is set
 
 		# Relation of the first name elements
 		self.only_first_fnm 									= False
@@ -65,13 +77,58 @@ class Persons(object):
 		self._maximum_time_gap 									= 50
 
 		# Technical parameters
-		self._max_graph_size 									= 50
+		self._max_graph_size 									= 5000 		# Safety valve: nodes of larger interrelated groups are not matched (up to version 0.2a: 50)
+		self._graph_backend 									= "bitset" 	# Backend of the transitive reduction: "bitset" or "sets" (slower for large groups, same result)
+		self._relation_cache_size 								= 2**19 	# Maximum number of forename pairs in the relation cache
+		self._collapse_duplicates 								= True 		# Cluster records with the same names (and source) as one record, expanded again after clustering (not with _detect_marriages or _split_by_time_gap)
+		self._equivalence_fast_path 							= True 		# Match forenames by a key (without comparisons and graphs), if their relation is an equivalence (neither subsets nor interlaced names, or middle name rule)
+		self._relation_backend 									= "python" 	# Backend of the forename comparison: "python" or "numpy" (vectorized per surname, only for the default order-respecting comparison, same result)
+		self._output_batch_size 								= 10000 	# Number of rows written to the output file at once (and per record batch of Arrow results)
+		self._input_batch_size 									= 10000 	# Number of rows read from Parquet files and Arrow tables at once
+		self._database_batch_size 								= 10000 	# Number of rows fetched from a database cursor at once and written back to a database per transaction
+		self._parallel_chunk_size 								= 2000 		# Minimum number of nodes per task if surnames are processed on several processes (n_jobs)
+		self._worker_options 									= [	"only_first_fnm", "middle_name_rule", "match_subsets", "match_interlaced", "ignore_order_of_forenames", "_equivalence_fast_path",
+																	"absolute_position_matters", "_max_graph_size", "_graph_backend", "_relation_cache_size", "_relation_backend" ] 	# Options passed to the worker processes
 
 		self._table_with_unique_names = "known persons table"
 
+		# Path taken by the last run of persons_from_names: "equivalence" (forenames matched by a key) or "graph" (relation matrix and graphs of subsets)
+		self.matching_path 				= None
+
 		# Coding of the adjacency matrix (no parameter, do not change)
-		self._it_subset 				= 1
-		self._me_subset 				= -1
+		self._it_subset 				= RelationMatrix.it_subset
+		self._me_subset 				= RelationMatrix.me_subset
+		self._crossed 					= RelationMatrix.crossed
+		self._different 				= RelationMatrix.different
+		self._identical 				= RelationMatrix.identical
+
+		# Coding of the results of _compare in the adjacency matrix
+		self._relation_codes 			= {		self._it_subset : self._it_subset,
+												self._me_subset : self._me_subset,
+												"crossed" 	: self._crossed,
+												"different" : self._different
+											}
+
+		# Mapping for converting the perspective of the name comparison
+		self._flip 						= {		self._it_subset : self._me_subset,
+												self._me_subset : self._it_subset,
+												"crossed" 	: "crossed",
+												"different" : "different",
+												"equal" 	: "equal"
+											}
+		# Kinds of matches of tokens from the other perspective
+		self._flip_initial 				= {		"me_initial": "it_initial",
+												"it_initial": "me_initial"
+											}
+
+		# Integer IDs of the forename tokens and initials and of the forenames (used by the signatures and the relation cache)
+		self._tokens 					= TokenTable()
+		self._forename_ids 				= {}
+
+		# Cache of forename relations, shared by all surnames (and runs with the same options)
+		self._relation_cache 			= collections.OrderedDict()
+		self._relation_cache_statistics = {"hits": 0, "misses": 0, "evictions": 0}
+		self._update_relation_options()
 
 		# Timezone and time format, used in the saved data
 		self._tz 						= pytz.timezone('Europe/Berlin')
@@ -91,17 +148,31 @@ class Persons(object):
 		global debug, snm_debug, fnm_debug
 		return debug and snm==snm_debug and fnm.find("M")>-1
 
-	def _make_flat_tree(self, input_data, names, source):
+	def _make_flat_tree(self, input_data, names, source, n_jobs=1):
 		''' Make a dictionarytree with the levels . -> [last name] -> [initial first first name] -> ["records"] / ["matrix"] .
-			The matrix contains a list of vectors. Each vector compares the corresponding entry of ["records"] to the other records.
+			The matrix (RelationMatrix) compares the nodes (sets of records with equal names) of a last name to each other.
 		'''
 
-		# Mapping for converting the perspective of the name comparison
-		flip 							= {		self._it_subset : self._me_subset,
-												self._me_subset : self._it_subset,
-												"crossed" 	: "crossed",
-												"different" : "different"
-											}
+		# Options relevant for the relation cache
+		self._update_relation_options()
+
+		# Compare only names with the same first initial, if names with different first initials can't be related
+		first_initial_blocking 			= self._first_initial_blocking()
+
+		# Compare the new forenames of a last name in one vectorized pass (numpy backend)
+		vectorized 						= self._vectorized_relations()
+
+		# Match the new forenames by a key, if the relation is an equivalence
+		equivalence 					= self._equivalence_matching()
+
+		# Surnames after particle removal (each distinct surname is processed only once)
+		particles 						= list(self.particles)
+		particles_removed 				= {}
+
+		# Records with equal names of the table are clustered as one record (the first one), the others are its duplicates (not for known persons,
+		# whose records are separated from each other, and not if the clusters depend on the other data of the records)
+		collapse 						= self._collapse_duplicates and not( self._detect_marriages or self._split_by_time_gap ) and source["source_type"]!=self._table_with_unique_names
+		representatives 				= {}
 
 		# Iterate over records from the database
 		for row in input_data:
@@ -138,14 +209,14 @@ class Persons(object):
 				# Normalize first name
 				if row["fnm"] is not None:
 					if self.only_first_fnm:
-						row["fnm_normalized"] 					= normalize(row["fnm"]).split(" ")[0]
+						row["fnm_normalized"] 					= normalize_cached(row["fnm"]).split(" ")[0]
 					else:
-						row["fnm_normalized"] 					= normalize(row["fnm"])
+						row["fnm_normalized"] 					= normalize_cached(row["fnm"])
 				else:
 					continue
 				# Normalize last name
 				if row["snm"] is not None:
-					row["snm_normalized"] 					= normalize(row["snm"])
+					row["snm_normalized"] 					= normalize_cached(row["snm"])
 				else:
 					continue
 
@@ -156,7 +227,9 @@ class Persons(object):
 					):
 						#int(row["id"]) in [20509,8105,20507,4505,7402,31386]):  
 				if self.remove_particles_suffixes:
-					row["snm_normalized"] 									= remove_particles(row["snm_normalized"])
+					if row["snm_normalized"] not in particles_removed:
+						particles_removed[row["snm_normalized"]] 			= remove_particles(row["snm_normalized"], particles)
+					row["snm_normalized"] 									= particles_removed[row["snm_normalized"]]
 				#create virtual records for possible born names (family names)
 				if self._detect_marriages: 
 					if self._marriage_name_pattern.match(row["snm_normalized"]) is not None:
@@ -183,66 +256,53 @@ class Persons(object):
 								input_data.append(virtual_record)
 
 				############################################################
-				# Build tree
+				# Build tree (grouping pass: surname -> distinct forenames -> records)
 
 				# -1 indicates that the record doesn't belong to a cluster yet
 				row["cluster"]=-1				
 				
 				#Level of the last name
 				if row["snm_normalized"] not in names.keys():
-					names[row["snm_normalized"]]				= {}							# New last name
-					# The matrix indices are node indices -> each node contains all equally names records (two-sided mapping given by records_by_node and node_by_record)
-					names[row["snm_normalized"]] 				= {"records": [row], "matrix": [["identical"]], "records_by_node": [[0]], "node_by_record": [0]}
-				
-				# If existing first letter, add record to structure and matrix
+					names[row["snm_normalized"]]				= self._new_surname_block()		# New last name
+				block 											= names[row["snm_normalized"]]
+
+				# Record number (= length of the existing list)
+				record_number 									= len(block["records"])
+				# Add the new record to the tree
+				block["records"]								. append(row)
+
+				# Name seen before in this table: duplicate of the first record with the name (the node is the node of that record)
+				if collapse and (row["snm_normalized"], row["fnm_normalized"]) in representatives:
+					representative 								= representatives[ (row["snm_normalized"], row["fnm_normalized"]) ]
+					block["duplicates"] 						. setdefault(representative, []) . append(record_number)
+					block["node_by_record"] 					. append( block["node_by_record"][representative] )
+					continue
+				representatives[ (row["snm_normalized"], row["fnm_normalized"]) ] 	= record_number
+
+				# Forename seen before (in a previous table): map to the node found back then
+				if row["fnm_normalized"] in block["node_by_name"]:
+					existing_node_index 						= block["node_by_name"][row["fnm_normalized"]]
+					block["records_by_node"][existing_node_index]. append(record_number)
+					block["node_by_record"] 					. append(existing_node_index)
+				# New forename: node is determined in the relation pass
 				else:
-					# Assume we are dealing with a new node
-					new_node 									= True
-					# Create easy reference to the node name / record name mapping
-					records_by_node								= names[row["snm_normalized"]]["records_by_node"]
-					node_by_record								= names[row["snm_normalized"]]["node_by_record"]
-					# Record number (= length of the existing list)
-					record_number 								= len(names[row["snm_normalized"]]["records"])
-					# Add the new record to the tree
-					names[row["snm_normalized"]]["records"]		. append(row)
-					# Start new node (will be removed again, if record turns out to be equal to existing node)
-					records_by_node 							. append([record_number])
-					# Start new row in matrix (will be removed again, if record turns out to be equal to existing node)
-					names[row["snm_normalized"]]["matrix"] 		. append([])
-					########################################################
-					## Comparison of all record-existing node combinations (comparison matrix ["matrix"])
-					# Iterate over all existing nodes
-					for existing_node_index in range( len( names[row["snm_normalized"]]["matrix"] )-1 ):
-						# Compare new record to an existing record (from the perspecitve of the new entry)
-						comparison_result=self._compare(row["fnm_normalized"], names[row["snm_normalized"]]["records"][ records_by_node[existing_node_index][0] ]["fnm_normalized"])
-						#print("comparing:", row["fnm_normalized"], names[row["snm_normalized"]]["records"][ records_by_node[existing_node_index][0] ]["fnm_normalized"],comparison_result)
-						# If row is equal to existing
-						if comparison_result=="equal":
-							# Whoa, wait, this is not a new node
-							new_node 							= False
-							# Map to an existing node
-							records_by_node[existing_node_index].append(record_number)
-							#original: node_by_record.append(node_by_record[existing_node_index])
-							node_by_record.append(existing_node_index)
-							# Remove the matrix row added for the wrongly assumed new node
-							names[row["snm_normalized"]]["matrix"].pop(-1)
-							# Remove the new node added for the wrongly assumed new node
-							records_by_node 					. pop(-1) # WL: the record number of the one, whose forename has never appeared 
-							# This is all an Alter Hut, let's not waste our time here with more comparisons
-							#print("equal",row,names[row["snm_normalized"]]["records"][records_by_node[existing_node_index][0] ])
-							break
-						else:
-							# Append to the new record's matrix vector (horizontal part of the matrix)
-							names[row["snm_normalized"]]["matrix"][-1].append(comparison_result)
-
-					if new_node:
-						# Map current record to a new node
-						node_by_record 							. append( len(records_by_node)-1 )
-						# Add comparison to the new node itself (it's not only equal, but identical to itself)
-						names[row["snm_normalized"]]["matrix"][-1].append("identical")
-						# Fill the vertical parts of the existing nodes vectors with the additional entry (kind of a waste, but we like squares - go Spongebob, go!)
-						for existing_node_index in range( len( names[row["snm_normalized"]]["matrix"] )-1 ):
-							names[row["snm_normalized"]]["matrix"][existing_node_index].append( flip[ names[row["snm_normalized"]]["matrix"][-1][existing_node_index] ] )
+					block["node_by_record"] 					. append(None)
+					block["pending"] 							. setdefault(row["fnm_normalized"], []) . append(record_number)
+
+		############################################################
+		# Build tree (relation pass: compare the new distinct forenames of each surname with the existing nodes)
+		snm_keys 										= [ snm_key for snm_key in names if len(names[snm_key]["pending"])>0 ]
+		if n_jobs>1 and len(snm_keys)>1:
+			# Surnames in parallel (the records stay in this process)
+			tasks 										= [ ({ key: value for key, value in names[snm_key].items() if key!="records" }, first_initial_blocking, vectorized, equivalence, True) for snm_key in snm_keys ]
+			sizes 										= [ len(names[snm_key]["signatures"]) + len(names[snm_key]["pending"]) for snm_key in snm_keys ]
+			for snm_key, block in zip(snm_keys, self._map_blocks("_add_nodes", tasks, sizes, n_jobs)):
+				names[snm_key] 							. update(block)
+				# Token IDs of this process
+				self._encode_signatures(names[snm_key])
+		else:
+			for snm_key in snm_keys:
+				self._add_nodes(names[snm_key], first_initial_blocking, vectorized, equivalence)
 
 		# remove snm_key, which only contains virtual records
 		if self._detect_marriages:					
@@ -253,326 +313,153 @@ class Persons(object):
 				except:
 					pass
 
-	def _find_interrelated(self, names, snm_key, to_process, relevant_relations, matching_code=set()): # WL: set(): disordered without repetition
-		''' Find all nodes that are interrelated (to the first node to be processed and each other)
+	def _new_surname_block(self):
+		''' Empty tree structure of a last name
 		'''
 
-		interrelated 			= set( [to_process[0]] )
-		interrelated_new 		= set( [to_process[0]] )
-		to_process 				. remove(to_process[0])
-		while len(interrelated_new)>0:
-
-			temp			 	= set()
-			# Iterate over all new items
-			for i_node in interrelated_new:
-				# Iterate over all not assigned items
-				for i_other_node in to_process:
-					# Check if the item to be compared matches an item of the interrelated cluster
-					if i_other_node not in temp and names[snm_key]["matrix"][i_node][i_other_node] in relevant_relations:
-						temp.add(i_other_node)
-						if names[snm_key]["matrix"][i_node][i_other_node]=="crossed":
-							matching_code.add("interlaced")
-						elif names[snm_key]["matrix"][i_node][i_other_node] in [self._me_subset, self._it_subset]:
-							matching_code.add("vertical")
-			# Remove items assigned to the interrelated cluster from the list of items to be processed
-			for item in temp:
-				to_process.remove(item)
-			# Store items assigned as the new related items
-			interrelated_new 	= temp
-			interrelated 		. update(interrelated_new)
-		return interrelated
+		# The matrix indices are node indices -> each node contains all equally names records (two-sided mapping given by records_by_node and node_by_record)
+		return 	{
+					"records" 			: [],
+					"matrix" 			: RelationMatrix(),
+					"records_by_node" 	: [],
+					"node_by_record" 	: [],
+					"duplicates" 		: {},	# Record numbers of the duplicates of a record (equal names, not in records_by_node)
+					"signatures" 		: [],	# Forename signature of each node
+					"nodes_by_initial" 	: {},	# Nodes by the initial of their first forename
+					"node_by_name" 		: {},	# Node of each normalized forename
+					"pending" 			: {}	# Record numbers of the forenames not assigned to a node yet
+				}
 
-	def _cluster(self, names, cluster_list, cluster_number_list):
-		''' Cluster records from the given tree
+	def _add_nodes(self, block, first_initial_blocking, vectorized=False, equivalence=False, encode=False):
+		''' Assign the pending distinct forenames of a last name to nodes (in the order of their first appearance).
+			Each forename is compared to the existing nodes. If it is equal to one of them, it's mapped to that node. Otherwise it's a new node.
+			If the relation is an equivalence (see _equivalence_key), the forename is mapped to the node with the same key instead (new nodes have no relations).
+			If the block comes from another process (encode), the signatures of the existing nodes are encoded with the token IDs of this process first.
 		'''
 
-		######################################################
-		# Identify related names. Sort into same cluster if compatible. Mark as ambiguous if incompatible.
-		# Level of the last name
-		for snm_key in sorted(names):
-			# Nodes to be processed
-			to_be_processed 			= list( range( len(names[snm_key]["records_by_node"]) ) )
-
-			# Create easy reference to the node name / record name mapping
-			records_by_node								= names[snm_key]["records_by_node"]
-			node_by_record								= names[snm_key]["node_by_record"]
-
-			while len(to_be_processed)>0:
-				# None of the interrelated items is "different" / mutually exclusive from the other (per interrelated group)
-				interrelated_consistent 					= True
-
-				# Initialize tag reporting which relationships occured in the matching
-				matching_code 								= set(["equal"])
-
-				#####################################################################
-				# Match all related items (match_subsets_and_interlaced==True)
-				if self.match_interlaced and self.match_subsets and interrelated_consistent:
-				# original: if match_subsets_and_interlaced and interrelated_consistent:
-					# Break condition for the case a pure subset is removed (move back to while loop in that case)
-					pure_subset_removed 					= False
-					# Reset the matching code
-					matching_code 							= set(["equal"])
-					# Find all nodes that are interrelated (to the first node to be processed and each other)
-					interrelated 							= self._find_interrelated(names, snm_key, to_be_processed, ["identical", self._me_subset, self._it_subset, "crossed"], matching_code)
-
-					#########################################
-					# Check consistency of the set of interrelated items
-
-					# Find pure subsets with conflicting supersets
-					for item in interrelated:
-						# Only for pure subsets
-						if self._it_subset not in names[snm_key]["matrix"][item] and "crossed" not in names[snm_key]["matrix"][item] and not pure_subset_removed:
-							# Compare all their supersets
-							for first in interrelated:
-								if names[snm_key]["matrix"][item][first]==self._me_subset and not pure_subset_removed:
-									for second in interrelated:
-										if names[snm_key]["matrix"][item][second]==self._me_subset and not pure_subset_removed:
-											# If the supersets of the pure subset are conflicting
-											if names[snm_key]["matrix"][first][second]=="different":
-												pure_subset_removed 	= True
-												item_to_remove 			= item
-											# _find_interrelated might not have checked all possible pairs for "crossed" relationships, therefore add this info to matching_code
-											elif names[snm_key]["matrix"][first][second]=="crossed":
-												matching_code.add("interlaced")
+		if encode:
+			self._encode_signatures(block)
+
+		# Nodes that received records
+		changed_nodes 									= set()
+
+		# Split the forenames into their parts (once per node, instead of once per comparison)
+		signatures 										= [ self._forename_signature(fnm) for fnm in block["pending"] ]
+		# Relations of all new forenames at once (only distinct names are "equal" under the vectorized comparison, so each forename is a new node)
+		vectorized 										= vectorized and len(block["signatures"]) + len(signatures) >= kernel_minimum_size
+		if vectorized:
+			precomputed 								= vectorized_relations(block["signatures"] + signatures, len(block["signatures"]))
+		# Node of each key (the first node of a key, the only one under an equivalence)
+		if equivalence:
+			node_by_key 								= {}
+			for existing_node_index, existing_signature in enumerate(block["signatures"]):
+				node_by_key 							. setdefault(self._equivalence_key(existing_signature), existing_node_index)
+
+		for pending_index, (fnm, record_numbers) in enumerate(block["pending"].items()):
+			signature 									= signatures[pending_index]
+			# Relations of the new node that are not "different" (only used, if the forename turns out to be a new node)
+			relations 									= {}
+			node 										= None
+			# Existing nodes to compare with (nodes with other first initials are different anyway, if blocking applies)
+			if equivalence:
+				# Node with the same key (no comparisons needed)
+				key 									= self._equivalence_key(signature)
+				node 									= node_by_key.get(key)
+				candidate_nodes 						= []
+			elif vectorized:
+				# Relations found by the vectorized comparison, the remaining nodes are compared one by one
+				relations, candidate_nodes 				= precomputed[pending_index]
+			elif first_initial_blocking:
+				candidate_nodes 						= block["nodes_by_initial"].get(signature.initials[0], [])
+			else:
+				candidate_nodes 						= range( len(block["matrix"]) )
+			########################################################
+			## Comparison of the forename with all existing nodes (comparison matrix ["matrix"])
+			for existing_node_index in candidate_nodes:
+				# Compare new forename to an existing node (from the perspecitve of the new forename)
+				comparison_result 						= self._relation(signature, block["signatures"][existing_node_index])
+				# If forename is equal to existing
+				if comparison_result=="equal":
+					# Whoa, wait, this is not a new node
+					node 								= existing_node_index
+					# This is all an Alter Hut, let's not waste our time here with more comparisons
+					break
+				elif comparison_result!="different":
+					# Memorize for the new node's matrix vector
+					relations[existing_node_index] 		= self._relation_codes[comparison_result]
+
+			if node is None:
+				# Add the node to the matrix (the other perspective is derived by the matrix)
+				node 									= block["matrix"].add_node(relations)
+				block["records_by_node"] 				. append([])
+				block["signatures"] 					. append(signature)
+				block["nodes_by_initial"] 				. setdefault(signature.initials[0], []) . append(node)
+				if equivalence:
+					node_by_key[key] 					= node
+
+			# Map the records to the node
+			block["node_by_name"][fnm] 					= node
+			block["records_by_node"][node] 				. extend(record_numbers)
+			for record_number in record_numbers:
+				block["node_by_record"][record_number] 	= node
+				for duplicate in block["duplicates"].get(record_number, []):
+					block["node_by_record"][duplicate] 	= node
+			changed_nodes 								. add(node)
+
+		# Records of a node in the order of their appearance
+		for node in changed_nodes:
+			block["records_by_node"][node] 				. sort()
+		block["pending"] 								= {}
+		return block
+
+	def _encode_signatures(self, block):
+		''' Signatures of the nodes of a block (and nodes by initial) with the token IDs of this instance (token IDs are only valid within one process)
+		'''
 
-					# Remove the pure subset
-					if pure_subset_removed:
-						# Assign the pure subset to a cluster
-						for i_record in records_by_node[item_to_remove]:
-							# Reset the matching code
-							matching_code 							= set(["equal"])
-							# Assign cluster to record
-							names[snm_key]["records"][i_record]["cluster"]=self._cluster_number
-							names[snm_key]["records"][i_record]["matching"]=matching_code
-							# record the cluster nr and id for rework for marriage name later
-							if self._detect_marriages:
-								if "split_for_detecting_marriage" in names[snm_key]["records"][i_record]:
-									if names[snm_key]["records"][i_record]["id"] not in cluster_number_list:
-										cluster_number_list[names[snm_key]["records"][i_record]["id"]] = {}
-									cluster_number_list[names[snm_key]["records"][i_record]["id"]][0] = self._cluster_number
-								elif "virtual_row_nr" in names[snm_key]["records"][i_record]:
-									if names[snm_key]["records"][i_record]["id"] not in cluster_number_list:
-										cluster_number_list[names[snm_key]["records"][i_record]["id"]] = {}
-									if names[snm_key]["records"][i_record]["virtual_row_nr"] == 0:
-										cluster_number_list[names[snm_key]["records"][i_record]["id"]][1] = self._cluster_number
-									else:
-										cluster_number_list[names[snm_key]["records"][i_record]["id"]][2] = self._cluster_number
-							# Check if cluster exists in list of clusters (and add if non-existent)
-							if self._cluster_number not in cluster_list.keys():
-								cluster_list[self._cluster_number]=[]
-							# Append the record to the cluster list
-							cluster_list[self._cluster_number].append(names[snm_key]["records"][i_record])
-						# Continue with next cluster number
-						self._cluster_number		+=1
-						# Remove from the set of interrelated items
-						interrelated.remove(item_to_remove)
-						# Change matrix to make the item different
-						for element in range( len(names[snm_key]["matrix"][item_to_remove])):
-							if element!=item_to_remove:
-								names[snm_key]["matrix"][item_to_remove][element]="different"
-								names[snm_key]["matrix"][element][item_to_remove]="different"
-						# Add the other interrelated items to the items to be processed
-						to_be_processed 		= to_be_processed + list(interrelated)
+		block["signatures"] 							= [ self._forename_signature(signature.name) for signature in block["signatures"] ]
+		block["nodes_by_initial"] 						= {}
+		for node, signature in enumerate(block["signatures"]):
+			block["nodes_by_initial"] 					. setdefault(signature.initials[0], []) . append(node)
 
-					# If a pure subset has been removed, go back to the while loop
-					else:
-						# For all pairs
-						for first in interrelated:
-							for second in interrelated:
-								# Check their consistency
-								if names[snm_key]["matrix"][first][second]=="different":
-									interrelated_consistent 	= False
-									# Set of interrelated needs to be processed again (in the code for single-strand matching below)
-									to_be_processed_level_2		= list( interrelated.copy() )
-
-						# If interrelated_consistent all entries get the same id
-						if interrelated_consistent:
-							# Assign a new cluster number
-							for i_node in interrelated:
-								# Iterate over all records in the node (equal names)
-								for i_record in records_by_node[i_node]:
-									# Assign cluster to record
-									names[snm_key]["records"][i_record]["cluster"]=self._cluster_number
-									names[snm_key]["records"][i_record]["matching"]=matching_code
-									# record the cluster nr and id for rework for marriage name later
-									if self._detect_marriages:
-										if "split_for_detecting_marriage" in names[snm_key]["records"][i_record]:
-											if names[snm_key]["records"][i_record]["id"] not in cluster_number_list:
-												cluster_number_list[names[snm_key]["records"][i_record]["id"]] = {}
-											cluster_number_list[names[snm_key]["records"][i_record]["id"]][0] = self._cluster_number
-										elif "virtual_row_nr" in names[snm_key]["records"][i_record]:
-											if names[snm_key]["records"][i_record]["id"] not in cluster_number_list:
-												cluster_number_list[names[snm_key]["records"][i_record]["id"]] = {}
-											if names[snm_key]["records"][i_record]["virtual_row_nr"] == 0:
-												cluster_number_list[names[snm_key]["records"][i_record]["id"]][1] = self._cluster_number
-											else:
-												cluster_number_list[names[snm_key]["records"][i_record]["id"]][2] = self._cluster_number
-									# Check if cluster exists in list of clusters (and add if non-existent)
-									if self._cluster_number not in cluster_list.keys():
-										cluster_list[self._cluster_number]=[]
-									# Append the record to the cluster list
-									cluster_list[self._cluster_number].append(names[snm_key]["records"][i_record])
-							
-							# Continue with next cluster number
-							self._cluster_number+=1
-
-				#####################################################################
-				# Match subsets (match_subsets_and_interlaced==False and match_subsets=True)
-				if self.match_subsets and ( self.match_interlaced==False or not(interrelated_consistent) ):
-
-					# Process only interrelated items from the previous interlaced part (if with interlaced) or process all items
-					if not(self.match_interlaced):
-						to_be_processed_level_2 				= to_be_processed
-
-					while len(to_be_processed_level_2)>0:
-
-						# Break condition for the case a pure subset is removed (move back to while loop in that case)
-						pure_subset_removed 					= False
-
-						# Find all nodes that are interrelated (to the first node to be processed and each other)
-						interrelated 							= self._find_interrelated(names, snm_key, to_be_processed_level_2, ["identical", self._me_subset, self._it_subset], set() )
-
-						# Find pure subsets with conflicting supersets
-						for item in interrelated:
-							# Only for pure subsets
-							if self._it_subset not in names[snm_key]["matrix"][item] and "crossed" not in names[snm_key]["matrix"][item] and not pure_subset_removed:
-								# Compare all their supersets
-								for first in interrelated:
-									if names[snm_key]["matrix"][item][first]==self._me_subset and not pure_subset_removed:
-										for second in interrelated:
-											if names[snm_key]["matrix"][item][second]==self._me_subset and not pure_subset_removed:
-												# If the supersets of the pure subset are conflicting
-												if names[snm_key]["matrix"][first][second]=="different":
-													pure_subset_removed 	= True
-													item_to_remove 			= item
-
-						# Remove the pure subset
-						if pure_subset_removed:
-							# Assign the pure subset to a cluster
-							for i_record in records_by_node[item_to_remove]:
-								# Assign cluster to record
-								names[snm_key]["records"][i_record]["cluster"]=self._cluster_number
-								names[snm_key]["records"][i_record]["matching"]=matching_code
-								# record the cluster nr and id for rework for marriage name later
-								if self._detect_marriages:
-									if "split_for_detecting_marriage" in names[snm_key]["records"][i_record]:
-										if names[snm_key]["records"][i_record]["id"] not in cluster_number_list:
-											cluster_number_list[names[snm_key]["records"][i_record]["id"]] = {}
-										cluster_number_list[names[snm_key]["records"][i_record]["id"]][0] = self._cluster_number
-									elif "virtual_row_nr" in names[snm_key]["records"][i_record]:
-										if names[snm_key]["records"][i_record]["id"] not in cluster_number_list:
-											cluster_number_list[names[snm_key]["records"][i_record]["id"]] = {}
-										if names[snm_key]["records"][i_record]["virtual_row_nr"] == 0:
-											cluster_number_list[names[snm_key]["records"][i_record]["id"]][1] = self._cluster_number
-										else:
-											cluster_number_list[names[snm_key]["records"][i_record]["id"]][2] = self._cluster_number
-								# Check if cluster exists in list of clusters (and add if non-existent)
-								if self._cluster_number not in cluster_list.keys():
-									cluster_list[self._cluster_number]=[]
-								# Append the record to the cluster list
-								cluster_list[self._cluster_number].append(names[snm_key]["records"][i_record])
-							# Continue with next cluster number
-							self._cluster_number		+=1
-							# Remove from the set of interrelated items
-							interrelated.remove(item_to_remove)
-							# Change matrix to make the item different
-							for element in range( len(names[snm_key]["matrix"][item_to_remove])):
-								if element!=item_to_remove:
-									names[snm_key]["matrix"][item_to_remove][element]="different"
-									names[snm_key]["matrix"][element][item_to_remove]="different"
-							# Add the other interrelated items to the items to be processed
-							to_be_processed_level_2		= to_be_processed_level_2 + list(interrelated)
-						# If a pure subset has been removed, go back to the while loop
-						else:
+	def _find_interrelated(self, matrix, to_process, relevant_relations, matching_code=set()): # WL: set(): disordered without repetition
+		''' Find all nodes that are interrelated (to the first node to be processed and each other)
+		'''
 
-							########################################
-							# Search for chains of subsets (without forks)
+		components 				= Components(matrix)
+		queue 					= components.queue(to_process)
+		interrelated 			= components.pop_component(queue, relevant_relations, matching_code)
+		# Remove items assigned to the interrelated cluster from the list of items to be processed
+		to_process[:] 			= list(queue)
+		return interrelated
 
-							if len(interrelated)>1 and len(interrelated)<=self._max_graph_size:
-								# Graph (create from adjacency matrix)
-								G 										= Graph(names[snm_key]["matrix"], list(interrelated))
+	def _cluster(self, names, cluster_list, cluster_number_list, n_jobs=1):
+		''' Cluster records from the given tree
+		'''
 
-								# Transitive reduction
-								G 										. transitive_reduction()
+		######################################################
+		# Identify related names. Sort into same cluster if compatible. Mark as ambiguous if incompatible.
+		# The surname blocks are independent of each other: cluster them (in parallel, if n_jobs>1) and number the clusters in the order of the surnames afterwards
+		snm_keys 										= sorted(names)
+		if self._equivalence_matching():
+			# No relations between the nodes (linear, no processes needed)
+			results 									= [ self._cluster_equivalence(names[snm_key]["records_by_node"]) for snm_key in snm_keys ]
+		elif n_jobs>1 and len(snm_keys)>1:
+			tasks 										= [ (names[snm_key]["matrix"], names[snm_key]["records_by_node"]) for snm_key in snm_keys ]
+			results 									= self._map_blocks("_cluster_block", tasks, [ len(names[snm_key]["records_by_node"]) for snm_key in snm_keys ], n_jobs)
+			# Apply the changes of the workers to the matrices (as in the sequential case)
+			for snm_key, (clusters, isolated_nodes) in zip(snm_keys, results):
+				for node in isolated_nodes:
+					names[snm_key]["matrix"] . isolate(node)
+		else:
+			results 									= [ self._cluster_block(names[snm_key]["matrix"], names[snm_key]["records_by_node"]) for snm_key in snm_keys ]
 
-								# Single stranded parts of the graph
-								single_strands 							= G.get_single_strands()
-							# To big graphs are bad
-							elif len(interrelated)>self._max_graph_size:
-								single_strands 							= [ [x] for x in interrelated]
-							# If there is only one node, no graph needed (case is redundant with the previous one)
-							else:
-								single_strands 							= [list(interrelated)]
-
-							#######################################
-							# Assign cluster numbers to the cleaned clusters
-							for strand in single_strands:
-								# If only one element, no vertical relationship
-								if len(strand)==1:
-									matching_code 						= set(["equal"])
-								else:
-									matching_code 						= set(["vertical"])
-								# Assign a new cluster number
-								for i_node in strand:
-									# Iterate over all records in the node (equal names)
-									for i_record in records_by_node[i_node]:
-										# Assign cluster to record
-										names[snm_key]["records"][i_record]["cluster"]=self._cluster_number
-										names[snm_key]["records"][i_record]["matching"]=matching_code
-										# record the cluster nr and id for rework for marriage name later
-										if self._detect_marriages:
-											if "split_for_detecting_marriage" in names[snm_key]["records"][i_record]:
-												if names[snm_key]["records"][i_record]["id"] not in cluster_number_list:
-													cluster_number_list[names[snm_key]["records"][i_record]["id"]] = {}
-												cluster_number_list[names[snm_key]["records"][i_record]["id"]][0] = self._cluster_number
-											elif "virtual_row_nr" in names[snm_key]["records"][i_record]:
-												if names[snm_key]["records"][i_record]["id"] not in cluster_number_list:
-													cluster_number_list[names[snm_key]["records"][i_record]["id"]] = {}
-												if names[snm_key]["records"][i_record]["virtual_row_nr"] == 0:
-													cluster_number_list[names[snm_key]["records"][i_record]["id"]][1] = self._cluster_number
-												else:
-													cluster_number_list[names[snm_key]["records"][i_record]["id"]][2] = self._cluster_number
-										# Check if cluster exists in list of clusters (and add if non-existent)
-										if self._cluster_number not in cluster_list.keys():
-											cluster_list[self._cluster_number]=[]
-										# Append the record to the cluster list
-										cluster_list[self._cluster_number].append(names[snm_key]["records"][i_record])
-								# Continue with next cluster number
-								self._cluster_number+=1
-
-					# If only subsets are matched, sync back items to be processed
-					if not(self.match_interlaced):
-						 to_be_processed				= to_be_processed_level_2
-
-				# If neither interlaced nor subsets shall be matched, match only the equal/identical entries
-				if not(self.match_subsets):
-					# Process all items until none is left
-					for i_node in to_be_processed:
-						for i_record in records_by_node[i_node]:
-							names[snm_key]["records"][i_record]["cluster"]=self._cluster_number
-							names[snm_key]["records"][i_record]["matching"]=matching_code
-							# record the cluster nr and id for rework for marriage name later
-							if self._detect_marriages:
-								if "split_for_detecting_marriage" in names[snm_key]["records"][i_record]:
-									if names[snm_key]["records"][i_record]["id"] not in cluster_number_list:
-										cluster_number_list[names[snm_key]["records"][i_record]["id"]] = {}
-									cluster_number_list[names[snm_key]["records"][i_record]["id"]][0] = self._cluster_number
-								elif "virtual_row_nr" in names[snm_key]["records"][i_record]:
-									if names[snm_key]["records"][i_record]["id"] not in cluster_number_list:
-										cluster_number_list[names[snm_key]["records"][i_record]["id"]] = {}
-									if names[snm_key]["records"][i_record]["virtual_row_nr"] == 0:
-										cluster_number_list[names[snm_key]["records"][i_record]["id"]][1] = self._cluster_number
-									else:
-										cluster_number_list[names[snm_key]["records"][i_record]["id"]][2] = self._cluster_number
-							# Check if cluster exists in list of clusters (and add if non-existent)
-							if self._cluster_number not in cluster_list.keys():
-								cluster_list[self._cluster_number]=[]
-							# Append the record to the cluster list
-							cluster_list[self._cluster_number].append(names[snm_key]["records"][i_record])
-						# Continue with next cluster number
-						self._cluster_number+=1
-					# End the while loop
-					break
+		# Level of the last name
+		for snm_key, (clusters, isolated_nodes) in zip(snm_keys, results):
+			for cluster in clusters:
+				# Add the duplicates of the records
+				if len(names[snm_key]["duplicates"])>0:
+					cluster 							= self._expand_duplicates(names[snm_key], cluster)
+				self._assign_cluster(names[snm_key]["records"], cluster, cluster_list, cluster_number_list)
 
 		######################################################
 		## Split or invalidate clusters with multiple distinct persons
@@ -631,36 +518,429 @@ class Persons(object):
 						cluster_list[cluster_number_list[cluster][0]][record]["split_for_detecting_marriage"] = "possible born surname not found"
 					del cluster_number_list[cluster]
 
+	def _map_blocks(self, method, tasks, sizes, n_jobs):
+		''' Call a method for independent surname blocks on a pool of n_jobs processes: method(*arguments) for each arguments tuple in tasks.
+			Large blocks (by the given sizes) are scheduled first, small blocks are sent in chunks (of at least _parallel_chunk_size) to keep the communication overhead low.
+			Returns the results in the order of the tasks.
+		'''
+
+		from concurrent.futures import ProcessPoolExecutor
+
+		# Options the worker processes need
+		options 							= { option: getattr(self, option) for option in self._worker_options }
+
+		# Chunks of task indices (largest blocks first)
+		chunks 								= []
+		chunk 								= []
+		chunk_size 							= 0
+		for i_task in sorted(range(len(tasks)), key=lambda i_task: -sizes[i_task]):
+			chunk 							. append(i_task)
+			chunk_size 						+= sizes[i_task]
+			if chunk_size>=self._parallel_chunk_size:
+				chunks 						. append(chunk)
+				chunk 						= []
+				chunk_size 					= 0
+		if len(chunk)>0:
+			chunks 							. append(chunk)
+
+		results 							= [None] * len(tasks)
+		with ProcessPoolExecutor(max_workers=min(n_jobs, len(chunks))) as executor:
+			chunk_results 					= executor.map(_call_in_worker, [options]*len(chunks), [method]*len(chunks), [ [tasks[i_task] for i_task in chunk] for chunk in chunks ])
+			for chunk, chunk_result in zip(chunks, chunk_results):
+				for i_task, result in zip(chunk, chunk_result):
+					results[i_task] 		= result
+		return results
+
+	def _cluster_block(self, matrix, records_by_node):
+		''' Cluster the nodes of a surname block.
+			Returns the clusters in the order of their creation (each a list of (record number, matching code)) and the nodes isolated in the matrix
+		'''
+
+		# Clusters of the block
+		clusters 						= []
+		# Pure subsets removed from the matrix
+		isolated_nodes 					= []
+
+		# Connected components of the nodes (adjacency lists of the matrix)
+		components 						= Components(matrix)
+
+		# Nodes to be processed
+		to_be_processed 				= components.queue( range( len(records_by_node) ) )
+
+		while len(to_be_processed)>0:
+			# None of the interrelated items is "different" / mutually exclusive from the other (per interrelated group)
+			interrelated_consistent 					= True
+
+			# Initialize tag reporting which relationships occured in the matching
+			matching_code 								= set(["equal"])
+
+			#####################################################################
+			# Match all related items (match_subsets_and_interlaced==True)
+			if self.match_interlaced and self.match_subsets and interrelated_consistent:
+			# original: if match_subsets_and_interlaced and interrelated_consistent:
+				# Reset the matching code
+				matching_code 							= set(["equal"])
+				# Find all nodes that are interrelated (to the first node to be processed and each other)
+				interrelated 							= components.pop_component(to_be_processed, [self._identical, self._me_subset, self._it_subset, self._crossed], matching_code)
+
+				#########################################
+				# Check consistency of the set of interrelated items
+
+				# Find pure subsets with conflicting supersets
+				item_to_remove, crossed_supersets 		= components.pure_subset_conflict(interrelated)
+				pure_subset_removed 					= item_to_remove is not None
+				# pop_component might not have checked all possible pairs for "crossed" relationships, therefore add this info to matching_code
+				if crossed_supersets:
+					matching_code.add("interlaced")
+
+				# Remove the pure subset
+				if pure_subset_removed:
+					# Assign the pure subset to a cluster (with a new matching code per record)
+					clusters 							. append( [ (i_record, set(["equal"])) for i_record in records_by_node[item_to_remove] ] )
+					# Remove from the set of interrelated items
+					interrelated.remove(item_to_remove)
+					# Change matrix to make the item different
+					components 				. isolate(item_to_remove)
+					isolated_nodes 			. append(item_to_remove)
+					# Add the other interrelated items to the items to be processed
+					components 				. extend(to_be_processed, interrelated)
+
+				# If a pure subset has been removed, go back to the while loop
+				else:
+					# For all pairs (until the first inconsistent pair)
+					for first in interrelated:
+						for second in interrelated:
+							# Check their consistency
+							if matrix.get(first, second)==self._different:
+								interrelated_consistent 	= False
+								break
+						if not interrelated_consistent:
+							break
+
+					# Set of interrelated needs to be processed again (in the code for single-strand matching below)
+					if not interrelated_consistent:
+						to_be_processed_level_2		= components.queue( interrelated.copy() )
+
+					# If interrelated_consistent all entries get the same id
+					if interrelated_consistent:
+						# Assign a new cluster (all records in the nodes)
+						clusters 						. append( [ (i_record, matching_code) for i_node in interrelated for i_record in records_by_node[i_node] ] )
+
+			#####################################################################
+			# Match subsets (match_subsets_and_interlaced==False and match_subsets=True)
+			if self.match_subsets and ( self.match_interlaced==False or not(interrelated_consistent) ):
+
+				# Process only interrelated items from the previous interlaced part (if with interlaced) or process all items
+				if not(self.match_interlaced):
+					to_be_processed_level_2 				= to_be_processed
+
+				while len(to_be_processed_level_2)>0:
+
+					# Find all nodes that are interrelated (to the first node to be processed and each other)
+					interrelated 							= components.pop_component(to_be_processed_level_2, [self._identical, self._me_subset, self._it_subset], set() )
+
+					# Find pure subsets with conflicting supersets
+					item_to_remove, crossed_supersets 		= components.pure_subset_conflict(interrelated)
+					pure_subset_removed 					= item_to_remove is not None
+
+					# Remove the pure subset
+					if pure_subset_removed:
+						# Assign the pure subset to a cluster
+						clusters 							. append( [ (i_record, matching_code) for i_record in records_by_node[item_to_remove] ] )
+						# Remove from the set of interrelated items
+						interrelated.remove(item_to_remove)
+						# Change matrix to make the item different
+						components 				. isolate(item_to_remove)
+						isolated_nodes 			. append(item_to_remove)
+						# Add the other interrelated items to the items to be processed
+						components 				. extend(to_be_processed_level_2, interrelated)
+					# If a pure subset has been removed, go back to the while loop
+					else:
+
+						########################################
+						# Search for chains of subsets (without forks)
+
+						if len(interrelated)>1 and len(interrelated)<=self._max_graph_size:
+							# Graph (compact subgraph of the component, from the adjacency lists of the component search)
+							G 										= Graph(components, interrelated)
+
+							# Transitive reduction
+							G 										. transitive_reduction(self._graph_backend)
+
+							# Single stranded parts of the graph
+							single_strands 							= G.get_single_strands()
+						# To big graphs are bad (safety valve for very dense groups)
+						elif len(interrelated)>self._max_graph_size:
+							single_strands 							= [ [x] for x in interrelated]
+						# If there is only one node, no graph needed (case is redundant with the previous one)
+						else:
+							single_strands 							= [list(interrelated)]
+
+						#######################################
+						# Assign clusters to the cleaned clusters
+						for strand in single_strands:
+							# If only one element, no vertical relationship
+							if len(strand)==1:
+								matching_code 						= set(["equal"])
+							else:
+								matching_code 						= set(["vertical"])
+							# Assign a new cluster (all records in the nodes)
+							clusters 								. append( [ (i_record, matching_code) for i_node in strand for i_record in records_by_node[i_node] ] )
+
+				# If only subsets are matched, sync back items to be processed
+				if not(self.match_interlaced):
+					 to_be_processed				= to_be_processed_level_2
+
+			# If neither interlaced nor subsets shall be matched, match only the equal/identical entries
+			if not(self.match_subsets):
+				# Process all items until none is left
+				for i_node in to_be_processed:
+					clusters 								. append( [ (i_record, matching_code) for i_record in records_by_node[i_node] ] )
+				# End the while loop
+				break
+
+		return clusters, isolated_nodes
+
+	def _cluster_equivalence(self, records_by_node):
+		''' Cluster the nodes of a surname block, if the relation of forenames is an equivalence: each node is a cluster (as by _cluster_block, same return values)
+		'''
+
+		clusters 						= []
+		# Matching code (shared by all clusters of the block, if subsets are not matched, as in _cluster_block)
+		matching_code 					= set(["equal"])
+		for records in records_by_node:
+			if self.match_subsets:
+				matching_code 			= set(["equal"])
+			clusters 					. append( [ (i_record, matching_code) for i_record in records ] )
+		return clusters, []
+
+	def _expand_duplicates(self, block, cluster):
+		''' Add the duplicates of the records to a cluster (list of (record number, matching code), the records of a node are consecutive).
+			The records of each node are in the order of their appearance, as if the duplicates had been clustered as records of their own.
+		'''
+
+		duplicates 						= block["duplicates"]
+		node_by_record 					= block["node_by_record"]
+		expanded 						= []
+		# Position of the first record of the current node, its number of records and whether they have duplicates
+		node_start 						= 0
+		node 							= None
+		node_count 						= 0
+		node_duplicates 				= False
+		for i_record, matching_code in cluster:
+			# Next node (if a node has several records with duplicates, they are interleaved)
+			if node_by_record[i_record]!=node:
+				if node_count>1 and node_duplicates:
+					expanded[node_start:] 	= sorted(expanded[node_start:])
+				node_start 				= len(expanded)
+				node 					= node_by_record[i_record]
+				node_count 				= 0
+				node_duplicates 		= False
+			expanded 					. append( (i_record, matching_code) )
+			node_count 					+=1
+			if i_record in duplicates:
+				expanded 				. extend( [ (duplicate, matching_code) for duplicate in duplicates[i_record] ] )
+				node_duplicates 		= True
+		if node_count>1 and node_duplicates:
+			expanded[node_start:] 		= sorted(expanded[node_start:])
+		return expanded
+
+	def _assign_cluster(self, records, cluster, cluster_list, cluster_number_list):
+		''' Assign the records of a cluster (list of (record number, matching code) as returned by _cluster_block) to the next cluster number
+		'''
+
+		for i_record, matching_code in cluster:
+			# Assign cluster to record
+			records[i_record]["cluster"]=self._cluster_number
+			records[i_record]["matching"]=matching_code
+			# record the cluster nr and id for rework for marriage name later
+			if self._detect_marriages:
+				if "split_for_detecting_marriage" in records[i_record]:
+					if records[i_record]["id"] not in cluster_number_list:
+						cluster_number_list[records[i_record]["id"]] = {}
+					cluster_number_list[records[i_record]["id"]][0] = self._cluster_number
+				elif "virtual_row_nr" in records[i_record]:
+					if records[i_record]["id"] not in cluster_number_list:
+						cluster_number_list[records[i_record]["id"]] = {}
+					if records[i_record]["virtual_row_nr"] == 0:
+						cluster_number_list[records[i_record]["id"]][1] = self._cluster_number
+					else:
+						cluster_number_list[records[i_record]["id"]][2] = self._cluster_number
+			# Check if cluster exists in list of clusters (and add if non-existent)
+			if self._cluster_number not in cluster_list.keys():
+				cluster_list[self._cluster_number]=[]
+			# Append the record to the cluster list
+			cluster_list[self._cluster_number].append(records[i_record])
+		# Continue with next cluster number
+		self._cluster_number+=1
+
+	def _forename_signature(self, fnm):
+		''' Parts of a normalized forename as used by _compare_signatures (tokens and initials as IDs of the token table)
+		'''
+
+		tokens 			= tuple( self._tokens.intern(x) for x in fnm.split(" ") )
+		initials 		= tuple( self._tokens.initial[x] for x in tokens )
+		fnm_id 			= self._forename_ids.setdefault(fnm, len(self._forename_ids))
+		# Order-independent form
+		token_set 		= frozenset(tokens)
+		full_initials 	= frozenset( initial for token, initial in zip(tokens, initials) if token!=initial )
+		unordered 		= UnorderedForename(token_set, full_initials, full_initials & token_set)
+		return ForenameSignature(fnm, fnm_id, tokens, initials, frozenset(tokens + initials), len(tokens), unordered)
+
+	def _unordered_part_comparison(self, me, it, it_unordered):
+		''' Kinds of matches of the tokens of 'me' in 'it' (ignore_order_of_forenames): "equal", "me_initial" (token of me is the initial of a token of it),
+			"it_initial" (it has the initial of the token of me) or "unknown". Each token is matched to the first related token of 'it'.
+			The kind follows from the order-independent form of 'it', unless 'it' has the token (or its initial) both as initial and as initial of a full name.
+		'''
+
+		single 			= self._tokens.single
+		initial 		= self._tokens.initial
+		part_comparison = set()
+		for token in me:
+			# Several related tokens of different kinds: first related token in the order of it
+			if initial[token] in it_unordered.mixed and ( single[token] or token in it_unordered.tokens ):
+				kind 				= "unknown"
+				for other in it:
+					if token==other:
+						kind 		= "equal"
+						break
+					elif token==initial[other]:
+						kind 		= "me_initial"
+						break
+					elif initial[token]==other:
+						kind 		= "it_initial"
+						break
+				part_comparison 	. add(kind)
+			elif token in it_unordered.tokens:
+				part_comparison 	. add("equal")
+			elif single[token]:
+				part_comparison 	. add( "me_initial" if token in it_unordered.full_initials else "unknown" )
+			elif initial[token] in it_unordered.tokens:
+				part_comparison 	. add("it_initial")
+			else:
+				part_comparison 	. add("unknown")
+		return part_comparison
+
 	def _compare(self, me, it):
 		''' Comparison of first names from the perspective of the first parameter
 		'''
 
 		if me==it:
 			return "equal"
+		self._update_relation_options()
+		return self._relation(self._forename_signature(me), self._forename_signature(it))
+
+	def _first_initial_blocking(self):
+		''' Returns if names with different first initials are always "different" under the present options
+		'''
+
+		# Only equal names match, Jones' rule requires equal first names, and the order-respecting comparison requires equal initials at each position
+		return not( self.match_subsets or self.match_interlaced ) or self.middle_name_rule or ( self.absolute_position_matters and not self.ignore_order_of_forenames )
+
+	def _vectorized_relations(self):
+		''' Returns if the new forenames are compared by the numpy backend (see vectorized_relations)
+		'''
+
+		if self._relation_backend!="numpy":
+			return False
+		if not numpy_available():
+			print("Requires 'numpy' for the numpy relation backend. Using the python backend.")
+			return False
+		# Only the order-respecting comparison with absolute positions is vectorized (without subsets and interlaced names only equal names match)
+		return not( self.middle_name_rule or self.ignore_order_of_forenames ) and self.absolute_position_matters and ( self.match_subsets or self.match_interlaced )
+
+	def _equivalence_matching(self):
+		''' Returns if the relation of forenames is an equivalence under the present options (forenames are "equal" or "different" only), and the key is used
+		'''
+
+		return self._equivalence_fast_path and ( self.middle_name_rule or not( self.match_subsets or self.match_interlaced ) )
+
+	def _equivalence_key(self, signature):
+		''' Key of a forename under an equivalence (see _equivalence_matching): forenames are "equal" if their keys are equal
+		'''
+
+		# Jones' rule: equal first name and equal middle initials (names without middle names are only equal to themselves)
+		if self.middle_name_rule and signature.length>1:
+			return (signature.tokens[0],) + signature.initials[1:]
+		return signature.id
+
+	def _update_relation_options(self):
+		''' Store the options the relation cache depends on
+		'''
+
+		self._relation_options 			= (self.middle_name_rule, self.match_subsets, self.match_interlaced, self.ignore_order_of_forenames, self.absolute_position_matters)
+		# Comparing the other way round gives the flipped result (except for the order-respecting comparison of subsets/interlaced names)
+		self._relation_antisymmetric 	= self.middle_name_rule or self.ignore_order_of_forenames or not( self.match_subsets or self.match_interlaced )
+
+	def _relation(self, me_signature, it_signature):
+		''' Cached version of _compare_signatures. Only one orientation of a pair is stored if the comparison is antisymmetric.
+		'''
+
+		if me_signature.id==it_signature.id:
+			return "equal"
+
+		# Key of the pair (orientation by forename ID if the other orientation can be derived by flipping)
+		flipped 						= self._relation_antisymmetric and it_signature.id < me_signature.id
+		if flipped:
+			key 						= (self._relation_options, it_signature.id, me_signature.id)
+		else:
+			key 						= (self._relation_options, me_signature.id, it_signature.id)
+
+		relation 						= self._relation_cache.get(key)
+		if relation is None:
+			self._relation_cache_statistics["misses"] 		+=1
+			if flipped:
+				relation 				= self._compare_signatures(it_signature, me_signature)
+			else:
+				relation 				= self._compare_signatures(me_signature, it_signature)
+			self._relation_cache[key] 	= relation
+			# Evict the least recently used pair
+			if len(self._relation_cache) > self._relation_cache_size:
+				self._relation_cache 	. popitem(last=False)
+				self._relation_cache_statistics["evictions"] 	+=1
+		else:
+			self._relation_cache_statistics["hits"] 		+=1
+			self._relation_cache 		. move_to_end(key)
+
+		if flipped:
+			return self._flip[relation]
+		return relation
+
+	def _compare_signatures(self, me_signature, it_signature):
+		''' Comparison of first names (given by their signatures) from the perspective of the first parameter
+		'''
+
+		if me_signature.id==it_signature.id:
+			return "equal"
 		elif not( self.middle_name_rule or self.match_subsets or self.match_interlaced ):
 			return "different"
 
-		me=me.split(" ")
-		it=it.split(" ")
+		# Token IDs (initial: ID of the initial of a token, single: token is an initial)
+		me 				= me_signature.tokens
+		it 				= it_signature.tokens
+		me_initials 	= me_signature.initials
+		it_initials 	= it_signature.initials
+		initial 		= self._tokens.initial
+		single 			= self._tokens.single
 
 		# If me and it do neither share a full name nor an initial, they are different
 		# Simple version (equality has been tested above)
-		if len(me)==1 and len(it)==1 and me[0][0:1]!=it[0][0:1]:
+		if me_signature.length==1 and it_signature.length==1 and me_initials[0]!=it_initials[0]:
 			return "different"
 		# General version of completely different 
-		if len( set(me + [x[0:1] for x in me]).intersection(set(it +[x[0:1] for x in it])) )==0:
+		if me_signature.parts.isdisjoint(it_signature.parts):
 			return "different"
 		# Common case that first firstname equal and second missing or initial
-		if len(me)<3 and len(it)<3 and me[0]==it[0] and not self.middle_name_rule:
+		if me_signature.length<3 and it_signature.length<3 and me[0]==it[0] and not self.middle_name_rule:
 			# If one has only one first name, it's a subset
-			if len(me)==1:
+			if me_signature.length==1:
 				return self._me_subset
-			elif len(it)==1:
+			elif it_signature.length==1:
 				return self._it_subset
 			# If one name has an initial as second first name that matches the other second first name, it's a subset
-			elif len(me[1])==1 and me[1]==it[1][0:1]:
+			elif single[me[1]] and me[1]==it_initials[1]:
 				return self._me_subset
-			elif len(it[1])==1 and it[1]==me[1][0:1]:
+			elif single[it[1]] and it[1]==me_initials[1]:
 				return self._it_subset
 
 		# If first name is equal and all middle names have the same initial (Jone's rule)
@@ -671,7 +951,7 @@ class Persons(object):
 					# Iterate over all middle names
 					for index in range( 1,len(me) ):
 						# If one of the initials differ, names are different
-						if me[index][0:1]!=it[index][0:1]:
+						if me_initials[index]!=it_initials[index]:
 							return "different"
 				# If first names are different
 				else:
@@ -683,57 +963,9 @@ class Persons(object):
 			return "equal"
 		# If first names can be in different order and subsets play a role
 		elif self.ignore_order_of_forenames:
-			# Check how me_parts relate to the other
-			part_comparison_me 								= []
-			for index_first in range(len(me)):
-				first 										= me[index_first]
-				part_comparison_me 							.append("unknown")
-				copy_it 									= it[:]
-				# Check if first of me is somewhere in 'it'
-				index_second								= 0
-				while index_second < len(copy_it):
-					second 									= copy_it[index_second]
-					if first==second:
-						part_comparison_me[index_first] 	= "equal"
-						copy_it.pop(index_second)
-						break
-					elif first==second[0:1]:
-						part_comparison_me[index_first] 	= "me_initial"
-						copy_it.pop(index_second)
-						break
-					elif first[0:1]==second:
-						part_comparison_me[index_first] 	= "it_initial"
-						copy_it.pop(index_second)
-						break
-					index_second 							+=1
-
-			# Check how it_parts relate to me
-			part_comparison_it 								= []
-			for index_first in range(len(it)):
-				first 										= it[index_first]
-				part_comparison_it 							.append("unknown")
-				copy_me 									= me[:]
-				# Check if first of it is somewhere in 'me'
-				index_second								= 0
-				while index_second < len(copy_me):
-					second 									= copy_me[index_second]
-					if first==second:
-						part_comparison_it[index_first] 	= "equal"
-						copy_me.pop(index_second)
-						break
-					elif first==second[0:1]:
-						part_comparison_it[index_first] 	= "it_initial"
-						copy_me.pop(index_second)
-						break
-					elif first[0:1]==second:
-						part_comparison_it[index_first] 	= "me_initial"
-						copy_me.pop(index_second)
-						break
-					index_second 							+=1
-
-			# Convert to set (for using set functions)
-			part_comparison_me 								= set(part_comparison_me)
-			part_comparison_it 								= set(part_comparison_it)
+			# Kinds of matches of the tokens of me in it and of the tokens of it in me (from the perspective of me)
+			part_comparison_me 								= self._unordered_part_comparison(me, it, it_signature.unordered)
+			part_comparison_it 								= set( self._flip_initial.get(x, x) for x in self._unordered_part_comparison(it, me, me_signature.unordered) )
 			part_comparison_all								= part_comparison_it.union(part_comparison_me)
 
 			# it shorter (I have more names) - it should be subset, unless elements are not in me (different) or I'm subset as well (crossed)
@@ -770,7 +1002,7 @@ class Persons(object):
 			# if positions of initials should be checked
 			if self.absolute_position_matters:
 				for initial_position in range(min(len(me),len(it))):
-					if me[initial_position][0] != it[initial_position][0]:
+					if me_initials[initial_position] != it_initials[initial_position]:
 						return "different"
 						comparing_continue = False
 						break
@@ -790,11 +1022,11 @@ class Persons(object):
 								part_comparison_me[index_first] 	= "equal"
 								index_last_found 					= index_second+1
 								break
-							elif first==second[0:1]:
+							elif first==initial[second]:
 								part_comparison_me[index_first] 	= "me_initial"
 								index_last_found 					= index_second+1
 								break
-							elif first[0:1]==second:
+							elif initial[first]==second:
 								part_comparison_me[index_first] 	= "it_initial"
 								index_last_found 					= index_second+1
 								break
@@ -1094,15 +1326,12 @@ class Persons(object):
 		''' Save cluster_list to csv or to authors table in a database
 		'''
 
-		##########################################
-		# Transform to list of dicts table structure
-		# Initialize output
-		output_data = self._make_flat_result(cluster_list, name_table_format)
-
 		# Recognize format, if none given
 		if output_format is None:
 			if "xls" in file_name:
 				output_format = "xls"
+			elif ".parquet" in file_name:
+				output_format = "parquet"
 			else:
 				output_format = "csv"
 
@@ -1111,18 +1340,38 @@ class Persons(object):
 
 		# If output to csv file
 		if output_format=="csv":
+			# Compress with gzip if the file name ends with ".gz"
+			compress = file_name[-3:]==".gz"
+			if compress:
+				file_name = file_name[:-3]
 			# Check if file extension is ".csv" and attach this string otherwise
 			if file_name[-1:]=="/" or file_name[-1:]=="\\" or file_name=="":
 				file_name="persons.csv"
 			elif file_name[-4:]!=".csv":
 				file_name += ".csv"
 			# Get the file
-			csvWriter = csv.writer(open(file_name, 'w'), lineterminator='\n')
-			# First write column headers
-			csvWriter.writerow( list(output_data[0].keys()) )
-			# Write data
-			for i in range( len(output_data) ):
-				csvWriter.writerow([output_data[i][k] for k in output_data[i] ])
+			if compress:
+				csv_file = gzip.open(file_name + ".gz", 'wt')
+			else:
+				csv_file = open(file_name, 'w')
+			with csv_file:
+				csvWriter = csv.writer(csv_file, lineterminator='\n')
+				# Write the rows cluster by cluster (in batches of _output_batch_size rows)
+				batch = []
+				header = True
+				for columns, values in self._flat_result_rows(cluster_list, name_table_format):
+					# First write column headers
+					if header:
+						csvWriter.writerow(columns)
+						header = False
+					batch.append(values)
+					if len(batch)>=self._output_batch_size:
+						csvWriter.writerows(batch)
+						batch = []
+				csvWriter.writerows(batch)
+				# Column headers of a result without records
+				if header:
+					csvWriter.writerow(self._flat_result_columns(name_table_format))
 		# If output to csv file
 		if output_format=="xls":
 			try:
@@ -1138,51 +1387,248 @@ class Persons(object):
 			# Get the file
 			xlsWriter = pd.ExcelWriter(file_name)
 			# Convert output to pandas DataFrame
-			df = self._convert_records_to_pandas(output_data)
+			df = self._convert_records_to_pandas(self._make_flat_result(cluster_list, name_table_format))
 			# First write column headers
 			df.to_excel(xlsWriter, "persons")
 			xlsWriter.save()
+		# If output to Parquet file
+		if output_format=="parquet":
+			try:
+				import pyarrow.parquet as pq
+			except ImportError:
+				print("Requires 'pyarrow' to export as Parquet.")
+				return
+			# Check if file extension is ".parquet" and attach this string otherwise
+			if file_name[-1:]=="/" or file_name[-1:]=="\\" or file_name=="":
+				file_name="persons.parquet"
+			elif file_name[-8:]!=".parquet":
+				file_name += ".parquet"
+			# Write the record batches (the file is removed again if writing fails)
+			writer = None
+			try:
+				for batch in self._flat_result_batches(cluster_list, name_table_format):
+					if writer is None:
+						writer = pq.ParquetWriter(file_name, batch.schema)
+					writer.write_batch(batch)
+			except:
+				if writer is not None:
+					writer.close()
+					writer = None
+					os.remove(file_name)
+				raise
+			finally:
+				if writer is not None:
+					writer.close()
+			# Result without records: empty file with the columns of the table format
+			if writer is None:
+				pq.write_table(self._flat_result_schema(cluster_list, name_table_format)[0].empty_table(), file_name)
+
+	def _write_back(self, cluster_list, connection, statement):
+		''' Write the person IDs and kinds of matches of the records of the name table back to a database (DB-API connection).
+			The statement is executed with the parameters (person_id, matching, id) of the records, in transactions of _database_batch_size records.
+		'''
 
-	def _make_flat_result(self, cluster_list, name_table_format):
-		''' Flaten cluster_list to list of records
+		cursor = connection.cursor()
+		batch = []
+		for i_cluster in cluster_list:
+			for record in cluster_list[i_cluster]:
+				# Only records of the name table (no known persons and virtual records)
+				if record["source"]==self._table_with_unique_names or "virtual_row_nr" in record:
+					continue
+				batch.append( (record["cluster"], self._matching_code(record), record["id"]) )
+				if len(batch)>=self._database_batch_size:
+					cursor.executemany(statement, batch)
+					connection.commit()
+					batch = []
+		if len(batch)>0:
+			cursor.executemany(statement, batch)
+			connection.commit()
+		cursor.close()
+
+	def _flat_result_rows(self, cluster_list, name_table_format):
+		''' Flaten cluster_list to rows (generator of the column names and the values of each record, cluster by cluster)
+			The tuple of column names is shared by all records with the same columns.
 		'''
 
-		##########################################
-		# Transform to list of dicts table structure
-		# Initialize output
-		output_data = []
 		processed_time = datetime.now(self._tz)
 		processed_time_string = processed_time.strftime(self._fmt)
+		# Column names by the optional fields of a record (year, middle name, time gap)
+		column_names = {}
 		# Iterate over all clusters
 		for i_cluster in cluster_list:
 			for record in cluster_list[i_cluster]:
-				# Compile table of the output data
-				matching_code = "equal"
-				if "vertical" in record["matching"]:
-					matching_code = "vertical"
-				if "interlaced" in record["matching"]:
-					matching_code = "interlaced"
-				output_data 		.append( collections.OrderedDict([
-												("person_id" 										, record["cluster"] 									),
-												# ("fnm_normalized"									, record["fnm_normalized"] 								),
-												# ("snm_normalized"									, record["snm_normalized"] 								),
-												("source"											, record["source"] 										),
-												(name_table_format["columns"]["id_column"]			, record["id"] 											),
-												(name_table_format["columns"]["fnm_column"]			, record["fnm"] 										),
-												(name_table_format["columns"]["snm_column"]			, record["snm"] 										),
-												("matching" 										, matching_code 								 		),
-												("saving_time"										, processed_time_string 								)
-										]) )
-				if "year" in record.keys():
-					output_data[-1][name_table_format["columns"]["year_column"]] 					= record["year"]
-				if "mnm" in record.keys():
-					output_data[-1][name_table_format["columns"]["mnm_column"]] 					= record["mnm"]
-				if "maximum_time_gap" in record.keys():
-					output_data[-1]["maximum_time_gap"] 											= record["maximum_time_gap"]
+				# Compile row of the output data
+				values 				= [ record["cluster"], record["source"], record["id"], record["fnm"], record["snm"], self._matching_code(record), processed_time_string ]
+				fields 				= ( "year" in record, "mnm" in record, "maximum_time_gap" in record )
+				if fields[0]:
+					values 			.append( record["year"] )
+				if fields[1]:
+					values 			.append( record["mnm"] )
+				if fields[2]:
+					values 			.append( record["maximum_time_gap"] )
 				if self._detect_marriages:
-					output_data[-1]["detecting_marriage"] 											= record["split_for_detecting_marriage"]
+					values 			.append( record["split_for_detecting_marriage"] )
+				if fields not in column_names:
+					column_names[fields] 	= self._flat_result_columns(name_table_format, fields)
+				yield column_names[fields], values
+
+	def _flat_result_columns(self, name_table_format, fields=None):
+		''' Column names of the rows of records with the optional fields (year, middle name, time gap) given by fields (see _flat_result_rows).
+			Without fields, the columns of the table format (used for a result without records).
+		'''
 
-		return output_data
+		columns = name_table_format["columns"]
+		if fields is None:
+			fields 			= ( columns["year_column"] is not None, columns["mnm_column"] is not None, False )
+		names 				= [ "person_id", "source", columns["id_column"], columns["fnm_column"], columns["snm_column"], "matching", "saving_time" ]
+		if fields[0]:
+			names 			.append( columns["year_column"] )
+		if fields[1]:
+			names 			.append( columns["mnm_column"] )
+		if fields[2]:
+			names 			.append( "maximum_time_gap" )
+		if self._detect_marriages:
+			names 			.append( "detecting_marriage" )
+		return tuple(names)
+
+	def _flat_result_schema(self, cluster_list, name_table_format):
+		''' Arrow schema of the rows of cluster_list (columns of the first row), from the types of the values of all rows.
+			Columns with values of different types (e.g. string IDs of the name table and integer IDs added to known persons) are strings,
+			columns without values are null (the year column int64). Empty years are not values.
+			Without rows, the columns of the table format (person ID, added IDs and years int64, names and matching strings, the other IDs null).
+			Returns the schema and the positions of the columns that are converted to strings.
+		'''
+
+		import pyarrow as pa
+		python_types 			= { bool: pa.bool_(), int: pa.int64(), float: pa.float64(), str: pa.string() }
+		header 					= None
+		samples 				= None
+		for columns, values in self._flat_result_rows(cluster_list, name_table_format):
+			if header is None:
+				header 			= columns
+				year_index 		= header.index(name_table_format["columns"]["year_column"]) if name_table_format["columns"]["year_column"] in header else None
+				samples 		= [ {} for column in header ]
+			elif columns!=header:
+				values 			= [ dict(zip(columns, values)).get(column) for column in header ]
+			for index, value in enumerate(values):
+				if value is None or (index==year_index and value==""):
+					continue
+				# One value of each type
+				if type(value) not in samples[index]:
+					samples[index][type(value)] 	= value
+		if header is None:
+			columns 			= name_table_format["columns"]
+			integer_columns 	= [ "person_id", columns["year_column"], "detecting_marriage" ] + ( ["name_id"] if columns["id_column"]=="name_id" else [] )
+			fields 				= [ pa.field(column, pa.int64() if column in integer_columns else pa.null() if column==columns["id_column"] else pa.string())
+									for column in self._flat_result_columns(name_table_format) ]
+			return pa.schema(fields), set()
+
+		fields 					= []
+		text_columns 			= set()
+		for index, column in enumerate(header):
+			value_types 		= set(samples[index])
+			if len(value_types)==0:
+				field_type 		= pa.int64() if index==year_index else pa.null()
+			elif value_types=={int, float}:
+				field_type 		= pa.float64()
+			elif len(value_types)==1:
+				value_type 		= value_types.pop()
+				field_type 		= python_types.get(value_type) or pa.array([ samples[index][value_type] ]).type
+			else:
+				field_type 		= pa.string()
+				text_columns 	. add(index)
+			fields 				. append( pa.field(column, field_type) )
+		return pa.schema(fields), text_columns
+
+	def _flat_result_batches(self, cluster_list, name_table_format):
+		''' Flaten cluster_list to Arrow record batches of _output_batch_size rows (generator, without dicts per record).
+			The columns are the ones of the first row (values of records with other columns are placed by the column names), the types are
+			the ones of _flat_result_schema. Empty years (e.g. of known persons) are null.
+		'''
+
+		import pyarrow as pa
+		schema, text_columns = self._flat_result_schema(cluster_list, name_table_format)
+		header = None
+		batch = []
+		rows = self._flat_result_rows(cluster_list, name_table_format)
+		while True:
+			row = next(rows, None)
+			if row is not None:
+				columns, values = row
+				if header is None:
+					header = columns
+				elif columns!=header:
+					values = [ dict(zip(columns, values)).get(column) for column in header ]
+				batch.append(values)
+			if len(batch)>=self._output_batch_size or (row is None and len(batch)>0):
+				# Transpose to columns
+				arrays = [ list(column) for column in zip(*batch) ]
+				if name_table_format["columns"]["year_column"] in header:
+					year_index = header.index(name_table_format["columns"]["year_column"])
+					arrays[year_index] = [ None if value=="" else value for value in arrays[year_index] ]
+				for index in text_columns:
+					arrays[index] = [ None if value is None else str(value) for value in arrays[index] ]
+				yield pa.RecordBatch.from_arrays([ pa.array(array, type=field.type) for array, field in zip(arrays, schema) ], schema=schema)
+				batch = []
+			if row is None:
+				return
+
+	def _make_flat_arrow(self, cluster_list, name_table_format):
+		''' Flaten cluster_list to a pyarrow Table
+		'''
+
+		import pyarrow as pa
+		batches = list(self._flat_result_batches(cluster_list, name_table_format))
+		if len(batches)==0:
+			return self._flat_result_schema(cluster_list, name_table_format)[0].empty_table()
+		return pa.Table.from_batches(batches)
+
+	def _matching_code(self, record):
+		''' Kind of the match of a record in the output ("equal", "vertical" or "interlaced")
+		'''
+
+		matching_code = "equal"
+		if "vertical" in record["matching"]:
+			matching_code = "vertical"
+		if "interlaced" in record["matching"]:
+			matching_code = "interlaced"
+		return matching_code
+
+	def _attach_to_frame(self, frame, cluster_list):
+		''' Copy of the input DataFrame with the columns "person_id" and "matching" attached to its rows (by the position of the records in the frame).
+			The input DataFrame is not changed. Rows that are not clustered (e.g. empty names) get the person_id -1.
+		'''
+
+		import numpy as np
+		person_id = np.full(len(frame), -1, dtype=np.int64)
+		matching = np.full(len(frame), None, dtype=object)
+		for i_cluster in cluster_list:
+			for record in cluster_list[i_cluster]:
+				if "position" in record and "virtual_row_nr" not in record:
+					person_id[record["position"]] 	= record["cluster"]
+					matching[record["position"]] 	= self._matching_code(record)
+		return frame.assign(person_id=person_id, matching=matching)
+
+	def _make_flat_frame(self, cluster_list, name_table_format):
+		''' Flaten cluster_list to a pandas DataFrame (from the rows of _flat_result_rows, without dicts per record)
+		'''
+
+		import pandas as pd
+		all_columns = set()
+		data = []
+		for columns, values in self._flat_result_rows(cluster_list, name_table_format):
+			all_columns.add(columns)
+			data.append(values)
+		# Records with different columns: same conversion as for the list of records
+		if len(all_columns)!=1:
+			return self._convert_records_to_pandas(self._make_flat_result(cluster_list, name_table_format))
+		return pd.DataFrame(data, columns=list(columns))
+
+	def _make_flat_result(self, cluster_list, name_table_format):
+		''' Flaten cluster_list to list of records
+		'''
+
+		return [ collections.OrderedDict(zip(columns, values)) for columns, values in self._flat_result_rows(cluster_list, name_table_format) ]
 
 	def _convert_records_to_pandas(self, in_data):
 		import pandas as pd
@@ -1192,9 +1638,7 @@ class Persons(object):
 		''' Find the node number for a given name in the tree 'names'
 		'''
 		try:
-			for index_record in range( len(names[snm]["records"]) ):
-				if names[snm]["records"][index_record]["fnm_normalized"]==fnm:
-					return names[snm]["node_by_record"][index_record]
+			return names[snm]["node_by_name"][fnm]
 		except:
 			pass
 		return -1
@@ -1215,7 +1659,7 @@ class Persons(object):
 		id_column = None
 
 		for colname in colnames:
-			colname_norm = normalize(colname).replace(" ", "")
+			colname_norm = normalize_cached(colname).replace(" ", "")
 			if any([(x in colname_norm) for x in forename_identifiers]):
 				fnm_column = colname
 			elif any([(x in colname_norm) for x in surname_identifiers]):
@@ -1255,14 +1699,179 @@ class Persons(object):
 		for record in table:
 			record[col_name] = ""
 
+	def _read_frame(self, frame, source_type, add_year=False, add_position=False):
+		''' Records of a pandas DataFrame, read column by column (only the columns identified by _identify_cols, instead of all columns
+			with to_dict("records")). A row index is added as ID if there is no ID column, an empty year if add_year and there is no year
+			column, and the position of the row in the frame if add_position (see _attach_to_frame).
+			Returns the records and the table format.
+		'''
+
+		table_format 					= self._identify_cols([ dict.fromkeys(frame.columns) ], source_type)
+		columns 						= [ column for column in table_format["columns"].values() if column is not None ]
+		records 						= [ dict(zip(columns, values)) for values in zip(*[ frame[column].tolist() for column in columns ]) ]
+		if table_format["columns"]["id_column"] is None:
+			self._add_id_col(records)
+			table_format["columns"]["id_column"] 	= "name_id"
+			table_format["id_added"] 				= True
+		if add_year and table_format["columns"]["year_column"] is None:
+			self._add_empty_col(records, "year")
+			table_format["columns"]["year_column"] 	= "year"
+		if add_position:
+			for position, record in enumerate(records):
+				record["position"] 		= position
+		return records, table_format
+
+	def _read_arrow(self, data, source_type, add_year=False):
+		''' Read a Parquet file (path), pyarrow Table or RecordBatchReader batch by batch. Only the columns identified by _identify_cols are read,
+			a row index is added as ID if there is no ID column (and an empty year, if add_year and there is no year column). Missing years are empty.
+			Returns the rows (iterator of dicts, the data is read while iterating) and the table format.
+		'''
+
+		try:
+			import pyarrow.parquet as pq
+		except ImportError:
+			print("Requires 'pyarrow' to read Parquet files and Arrow tables.")
+			return None, None
+
+		if "str" in str(type(data)):
+			data 						= pq.ParquetFile(data)
+			names 						= data.schema_arrow.names
+		else:
+			names 						= data.schema.names
+
+		# Columns used
+		table_format 					= self._identify_cols([ dict.fromkeys(names) ], source_type)
+		columns 						= [ column for column in table_format["columns"].values() if column is not None ]
+		year_column 					= table_format["columns"]["year_column"]
+		add_id 							= table_format["columns"]["id_column"] is None
+		if add_id:
+			table_format["columns"]["id_column"] 	= "name_id"
+			table_format["id_added"] 				= True
+		add_year 						= add_year and year_column is None
+		if add_year:
+			table_format["columns"]["year_column"] 	= "year"
+
+		# Record batches with the columns used
+		if "ParquetFile" in str(type(data)):
+			batches 					= data.iter_batches(batch_size=self._input_batch_size, columns=columns)
+		elif "Table" in str(type(data)):
+			batches 					= data.select(columns).to_batches(max_chunksize=self._input_batch_size)
+		else:
+			batches 					= data
+
+		def rows():
+			index 						= 0
+			for batch in batches:
+				for values in zip(*[ batch.column(column).to_pylist() for column in columns ]):
+					row 				= dict(zip(columns, values))
+					if year_column is not None and row[year_column] is None:
+						row[year_column] 	= ""
+					if add_id:
+						row["name_id"] 	= index
+					if add_year:
+						row["year"] 	= ""
+					index 				+=1
+					yield row
+
+		return rows(), table_format
+
+	def _read_cursor(self, data, source_type, add_year=False):
+		''' Read the result of a database query (DB-API cursor, or tuple of connection, query and optionally its parameters) with fetchmany,
+			in batches of _database_batch_size rows. Only the columns identified by _identify_cols are kept, a row index is added as ID if there is
+			no ID column (and an empty year, if add_year and there is no year column). Missing years (NULL) are empty.
+			Returns the rows (iterator of dicts, the rows are fetched while iterating) and the table format.
+		'''
+
+		if "tuple" in str(type(data)):
+			cursor 						= data[0].cursor()
+			cursor 						. execute(*data[1:])
+		else:
+			cursor 						= data
+		names 							= [ description[0] for description in cursor.description ]
+
+		# Columns used (by position)
+		table_format 					= self._identify_cols([ dict.fromkeys(names) ], source_type)
+		columns 						= [ (column, names.index(column)) for column in table_format["columns"].values() if column is not None ]
+		year_column 					= table_format["columns"]["year_column"]
+		add_id 							= table_format["columns"]["id_column"] is None
+		if add_id:
+			table_format["columns"]["id_column"] 	= "name_id"
+			table_format["id_added"] 				= True
+		add_year 						= add_year and year_column is None
+		if add_year:
+			table_format["columns"]["year_column"] 	= "year"
+
+		def rows():
+			index 						= 0
+			while True:
+				batch 					= cursor.fetchmany(self._database_batch_size)
+				if len(batch)==0:
+					return
+				for values in batch:
+					row 				= { column: values[position] for column, position in columns }
+					if year_column is not None and row[year_column] is None:
+						row[year_column] 	= ""
+					if add_id:
+						row["name_id"] 	= index
+					if add_year:
+						row["year"] 	= ""
+					index 				+=1
+					yield row
+
+		return rows(), table_format
+
+	def _read_csv(self, path, source_type, csv_options=None, add_year=False):
+		''' Read a csv file row by row (gzip compressed, if the file name ends with ".gz"). Only the columns identified by _identify_cols are kept,
+			a row index is added as ID if there is no ID column (and an empty year, if add_year and there is no year column).
+			csv_options: "encoding" of the file and format parameters of csv.reader (e.g. "dialect", "delimiter").
+			Returns the rows (iterator of dicts, the file is read while iterating) and the table format.
+		'''
+
+		options 						= dict(csv_options or {})
+		encoding 						= options.pop("encoding", None)
+		if path.endswith(".gz"):
+			csv_file 					= gzip.open(path, "rt", encoding=encoding, newline="")
+		else:
+			csv_file 					= open(path, "r", encoding=encoding, newline="")
+		reader 							= csv.reader(csv_file, **options)
+		header 							= next(reader, [])
+
+		# Columns used (by position)
+		table_format 					= self._identify_cols([ dict.fromkeys(header) ], source_type)
+		columns 						= [ (column, header.index(column)) for column in table_format["columns"].values() if column is not None ]
+		add_id 							= table_format["columns"]["id_column"] is None
+		if add_id:
+			table_format["columns"]["id_column"] 	= "name_id"
+			table_format["id_added"] 				= True
+		add_year 						= add_year and table_format["columns"]["year_column"] is None
+		if add_year:
+			table_format["columns"]["year_column"] 	= "year"
+
+		def rows():
+			with csv_file:
+				index 					= 0
+				for values in reader:
+					# Skip empty lines (as csv.DictReader)
+					if len(values)==0:
+						continue
+					row 				= { column: values[position] if position<len(values) else None for column, position in columns }
+					if add_id:
+						row["name_id"] 	= index
+					if add_year:
+						row["year"] 	= ""
+					index 				+=1
+					yield row
+
+		return rows(), table_format
+
 	def _convert_table_to_records(self, in_data, format):
 		if format=="pandas":
 			return in_data.to_dict("records")
 		if format=="csv":
 			import csv
 			# Get the file
-			csvReader = csv.DictReader(open(in_data, 'r'))
-			return [ row for row in csvReader ]
+			with open(in_data, 'r', newline='') as csv_file:
+				return [ row for row in csv.DictReader(csv_file) ]
 		if format=="xls":
 			try:
 				import pandas as pd
@@ -1276,6 +1885,27 @@ class Persons(object):
 	##########################################################
 	### Public functions ################################
 
+	def relation_cache_info(self):
+		''' 
+		Statistics of the cache of forename relations (accumulated over all runs of this instance).
+		Comparisons done in worker processes (n_jobs>1) or by the numpy relation backend are not included.
+		'''
+
+		statistics 						= dict(self._relation_cache_statistics)
+		requests 						= statistics["hits"] + statistics["misses"]
+		statistics["size"] 				= len(self._relation_cache)
+		statistics["maxsize"] 			= self._relation_cache_size
+		statistics["hit_rate"] 			= statistics["hits"] / requests if requests>0 else 0.0
+		return statistics
+
+	def clear_relation_cache(self):
+		''' 
+		Empty the cache of forename relations and reset its statistics.
+		'''
+
+		self._relation_cache 			. clear()
+		self._relation_cache_statistics = {"hits": 0, "misses": 0, "evictions": 0}
+
 	def plot_persons(self, snm, fnm, selection="interrelated"):
 		''' 
 		Draw a graph depicting the relationships between the names.
@@ -1300,20 +1930,20 @@ class Persons(object):
 			to_be_processed 		= [start_node] + to_be_processed
 			# Find relevant set of nodes
 			if selection=="interrelated":
-				nodes 				= self._find_interrelated(names, snm, to_be_processed, ["identical", self._me_subset, self._it_subset, "crossed"])
+				nodes 				= self._find_interrelated(names[snm]["matrix"], to_be_processed, [self._identical, self._me_subset, self._it_subset, self._crossed])
 			elif selection=="vertical":
-				nodes 				= self._find_interrelated(names, snm, to_be_processed, ["identical", self._me_subset, self._it_subset])
+				nodes 				= self._find_interrelated(names[snm]["matrix"], to_be_processed, [self._identical, self._me_subset, self._it_subset])
 			elif selection=="all":
 				nodes 				= to_be_processed
 
 			# Node names
 			node_names 				= set()
 
-			# Graph (create from adjacency matrix)
-			G 						= Graph(names[snm]["matrix"], list(nodes))
+			# Graph (compact subgraph of the selected nodes of the adjacency matrix)
+			G 						= Graph(names[snm]["matrix"], nodes)
 
 			# Transitive reduction
-			G 						. transitive_reduction()
+			G 						. transitive_reduction(self._graph_backend)
 
 			# Get top nodes sorted by first name
 			G 						. set_top_nodes()
@@ -1325,7 +1955,6 @@ class Persons(object):
 			# Get positions for a tree like layout
 			positions 				= G.get_node_positions() 
 
-			matrix 					= G.matrix
 
 			edges 					= []
 			vertical_edges 			= []
@@ -1340,7 +1969,7 @@ class Persons(object):
 					fnm_first 	= names[snm]["records"][ records_by_node[first][0] ]["fnm"]
 					fnm_second 	= names[snm]["records"][ records_by_node[second][0] ]["fnm"]
 					# If the nodes are in a subset relationship
-					if matrix[first][second] in [self._me_subset, self._it_subset] and (fnm_second, fnm_first) not in vertical_edges:
+					if G.get(first, second) in [self._me_subset, self._it_subset] and (fnm_second, fnm_first) not in vertical_edges:
 						edges.append( (fnm_first, fnm_second) )
 						vertical_edges.append( (fnm_first, fnm_second) )
 						labels.append( "subset" )
@@ -1349,7 +1978,7 @@ class Persons(object):
 						node_names.add(fnm_first)
 						node_names.add(fnm_second)
 					# If the nodes are in a non-transitive relationship
-					elif matrix[first][second]=="crossed" and (fnm_second, fnm_first) not in crossed_edges:
+					elif G.get(first, second)==self._crossed and (fnm_second, fnm_first) not in crossed_edges:
 						edges.append( (fnm_first, fnm_second) )
 						crossed_edges.append( (fnm_first, fnm_second) )
 						labels.append( "interlaced" )
@@ -1362,7 +1991,7 @@ class Persons(object):
 		else:
 			print("Name not found.")
 
-	def persons_from_names(self, name_table, known_persons=None, output_file=None, output_file_format=None, status_messages=True):
+	def persons_from_names(self, name_table, known_persons=None, output_file=None, output_file_format=None, status_messages=True, n_jobs=1, csv_options=None, return_result=True, attach_to_input=False, write_back=None):
 		"""
 		Identify persons in a table of names.
 		Check the file "examples.py" for usage examples.
@@ -1373,19 +2002,45 @@ class Persons(object):
 										-- "pandas" (pandas DataFrame)
 			  						-> accepts file path
 			  						-> the following file formats are supported
-			  							-- "csv" (csv file, requires additional parameter "path_name_table") 
+			  							-- "csv" (csv file, also gzip compressed ".csv.gz"; read row by row, only the name, ID and year columns are kept)
+			  							-- "parquet" (Parquet file, requires pyarrow; read batch by batch, only the name, ID and year columns are read)
 										-- "xls" (Excel file, requires additional parameter "path_name_table")
+									-> accepts pyarrow Table or RecordBatchReader (the result of Arrow and Parquet input is a pyarrow Table)
+									-> accepts the result of a database query: DB-API cursor (after execute) or tuple (connection, query) or (connection, query, parameters)
+										-- the rows are fetched in batches (fetchmany), the result is returned as records
 			- known_persons: 		table of names of known unique persons who have been identified previously
 									-> accepts file path if input_format="csv" or input_format="xls"
 			- output_file 			path for saving result in a file
 			- output_file_format: 	supported output file formats presently include
-									-- "csv" (default)
+									-- "csv" (default, gzip compressed if output_file ends with ".gz"; written cluster by cluster)
 									-- "xls"
+									-- "parquet" (default for file names ending with ".parquet", requires pyarrow; written batch by batch)
+			- n_jobs: 				number of processes for comparing and clustering the forenames of the surnames (-1 for all processors, default 1)
+									-> the result does not depend on the number of processes
+									-> on platforms starting processes with "spawn" (Windows, macOS), call from within an if __name__=="__main__": block
+			- return_result: 		return the result (default True); with return_result=False, the result is only saved to output_file and None is returned
+			- attach_to_input: 		pandas input only: return a copy of the input DataFrame (same rows in the same order) with the columns "person_id" and "matching"
+									attached, instead of the result table (rows with empty names get the person_id -1)
+			- write_back: 			tuple (connection, statement) for writing the result back to a database (DB-API connection)
+									-> the statement is executed (executemany) with the parameters (person_id, matching, id) of each record of name_table, e.g.
+									   "UPDATE names SET person_id=?, matching=? WHERE id=?" (the placeholders depend on the database module)
+									-> committed in batches
+									-> name_table must have an ID column (a column name containing "id", the key column used by the statement);
+									   without one, the rows would be numbered and a ValueError is raised
+			- csv_options: 			options for reading csv files (dict): "encoding" and the format parameters of Python's csv.reader, e.g. {"encoding": "utf-8", "delimiter": ";"}
+		After the run, the attribute matching_path tells how the forenames were matched: "equivalence" (by a key, if neither subsets nor interlaced
+		names are matched or the middle name rule applies) or "graph" (comparison of the forenames and graphs of subsets).
 		"""
 
 		# Save start time:
 		zeit=int(time.time())
 
+		# Number of processes
+		if n_jobs is None:
+			n_jobs = 1
+		elif n_jobs<0:
+			n_jobs = os.cpu_count() or 1
+
 		####
 		## Prepare input table
 		####
@@ -1400,21 +2055,56 @@ class Persons(object):
 				input_format = "csv"
 			elif "xls" in name_table:
 				input_format = "xls"
+			elif ".parquet" in name_table:
+				input_format = "arrow"
+		elif "pyarrow" in str(type(name_table)):
+			input_format = "arrow"
+		elif "tuple" in str(type(name_table)) or hasattr(name_table, "fetchmany"):
+			input_format = "cursor"
+
+		# Read csv files row by row and Parquet files, Arrow data and query results batch by batch (with the columns identified and the id column added)
+		if input_format in ["csv", "arrow", "cursor"]:
+			if input_format == "csv":
+				name_table, name_table_format = self._read_csv(name_table, "default table", csv_options)
+				if known_persons is not None:
+					known_persons, known_persons_format = self._read_csv(known_persons, self._table_with_unique_names, csv_options, add_year=True)
+			elif input_format == "cursor":
+				name_table, name_table_format = self._read_cursor(name_table, "default table")
+				if known_persons is not None:
+					known_persons, known_persons_format = self._read_cursor(known_persons, self._table_with_unique_names, add_year=True)
+			else:
+				name_table, name_table_format = self._read_arrow(name_table, "default table")
+				if name_table is None:
+					return
+				if known_persons is not None:
+					known_persons, known_persons_format = self._read_arrow(known_persons, self._table_with_unique_names, add_year=True)
+			# The marriage detection adds rows to the table
+			if self._detect_marriages:
+				name_table = list(name_table)
+				if known_persons is not None:
+					known_persons = list(known_persons)
+		# Read DataFrames column by column (positions of the rows are kept for attaching the result to the input)
+		elif input_format == "pandas":
+			input_frame = name_table
+			name_table, name_table_format = self._read_frame(input_frame, "default table", add_position=attach_to_input)
+			if known_persons is not None:
+				known_persons, known_persons_format = self._read_frame(known_persons, self._table_with_unique_names, add_year=True)
+		else:
+			# Convert table to internal data format
+			if input_format != "records":
+				name_table = self._convert_table_to_records(name_table, input_format)
 
-		# Convert table to internal data format
-		if input_format != "records":
-			name_table = self._convert_table_to_records(name_table, input_format)
-
-		# Identify forename col
-		name_table_format = self._identify_cols(name_table, "default table")
+			# Identify forename col
+			name_table_format = self._identify_cols(name_table, "default table")
 
-		# Add id column if missing
-		if name_table_format["columns"]["id_column"] is None:
-			self._add_id_col(name_table)
-			name_table_format["columns"]["id_column"]="name_id"
+			# Add id column if missing
+			if name_table_format["columns"]["id_column"] is None:
+				self._add_id_col(name_table)
+				name_table_format["columns"]["id_column"]="name_id"
+				name_table_format["id_added"]=True
 
 		# Same as above for known persons table
-		if known_persons is not None:
+		if known_persons is not None and input_format not in ["csv", "arrow", "cursor", "pandas"]:
 			# Convert table to internal data format
 			if input_format != "records":
 				known_persons = self._convert_table_to_records(known_persons, input_format)
@@ -1425,11 +2115,16 @@ class Persons(object):
 			if known_persons_format["columns"]["id_column"] is None:
 				self._add_id_col(known_persons)
 				known_persons_format["columns"]["id_column"]="name_id"
+				known_persons_format["id_added"]=True
 
 			if known_persons_format["columns"]["year_column"] is None:
 				self._add_empty_col(known_persons, "year")
 				known_persons_format["columns"]["year_column"]="year"
 
+		# Writing back needs the IDs of the database rows (not the row numbers added as IDs)
+		if write_back is not None and name_table_format.get("id_added", False):
+			raise ValueError("write_back requires an ID column in name_table (the key column of the statement), e.g. 'SELECT name_id, fnm, snm FROM names'.")
+
 		####
 		## Sort input data into a tree structure according to surname
 		####
@@ -1437,12 +2132,15 @@ class Persons(object):
 		# Internal data structure by surname
 		self._flat_tree=collections.OrderedDict()
 
+		# Path of the forename matching
+		self.matching_path = "equivalence" if self._equivalence_matching() else "graph"
+
 		if status_messages:
 			print("Tree creation in progress...")
-		self._make_flat_tree(name_table, self._flat_tree, name_table_format)
+		self._make_flat_tree(name_table, self._flat_tree, name_table_format, n_jobs)
 		if known_persons is not None:
 			# Identify forename col
-			self._make_flat_tree(known_persons, self._flat_tree, known_persons_format)
+			self._make_flat_tree(known_persons, self._flat_tree, known_persons_format, n_jobs)
 
 		####
 		## Person identification from forename
@@ -1455,7 +2153,7 @@ class Persons(object):
 
 		# to record in which clusters the original records and their virtual ones are assigned 
 		cluster_number_list = {}
-		self._cluster(self._flat_tree, cluster_list, cluster_number_list)
+		self._cluster(self._flat_tree, cluster_list, cluster_number_list, n_jobs)
 
 		if self._split_by_time_gap and name_table_format["columns"]["year_column"] is not None:
 			if status_messages:
@@ -1485,12 +2183,32 @@ class Persons(object):
 		# if status_messages:
 		# 	print( "Name matching completed in {} seconds. Identified {} persons.".format( str( int(time.time()) - zeit ) , str(len(cluster_list)) ) )
 
-		if input_format=="pandas":
-			return self._convert_records_to_pandas(self._make_flat_result(cluster_list, name_table_format))
+		# Write person IDs back to the database
+		if write_back is not None:
+			if status_messages:
+				print("Writing the results back to the database")
+			self._write_back(cluster_list, *write_back)
+
+		if not return_result:
+			return None
+		elif input_format=="pandas" and attach_to_input:
+			return self._attach_to_frame(input_frame, cluster_list)
+		elif input_format=="pandas":
+			return self._make_flat_frame(cluster_list, name_table_format)
+		elif input_format=="arrow":
+			return self._make_flat_arrow(cluster_list, name_table_format)
 		elif input_format=="records" and "dict" in str(type(name_table[0])):
 			return [ dict(record) for record in self._make_flat_result(cluster_list, name_table_format) ]
 		else:
 			return self._make_flat_result(cluster_list, name_table_format)
 
 
+def _call_in_worker(options, method, tasks):
+	''' Call a method of Persons (with the given options) in a worker process (see Persons._map_blocks)
+	'''
 
+	persons 							= Persons()
+	for option, value in options.items():
+		setattr(persons, option, value)
+	persons._update_relation_options()
+	return [ getattr(persons, method)(*arguments) for arguments in tasks ]
@@ -0,0 +1,140 @@
+# Copyright 2017 Sascha Schweitzer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#    http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+
+from persons.support_functions.relation_matrix import RelationMatrix
+
+class Components:
+	''' Connected components of the nodes of a surname block (edges: relations with one of the given codes).
+		The relations of each node are read from the RelationMatrix once and kept as adjacency lists.
+		Nodes to be processed are kept in queues (ordered dicts {node: rank}), so assigned nodes are removed in constant time.
+	'''
+
+	def __init__(self, matrix):
+		self.matrix 		= matrix
+		# Adjacency lists {other node: code} (from the perspective of the node)
+		self._rows 			= {}
+		# Rank of the next node added to a queue
+		self._rank 			= 0
+		# Pure subset index (see pure_subset_conflict)
+		self._subset_info 	= {}
+
+	def queue(self, nodes=()):
+		''' New queue of nodes to be processed
+		'''
+		queue 				= collections.OrderedDict()
+		self.extend(queue, nodes)
+		return queue
+
+	def extend(self, queue, nodes):
+		''' Append nodes to the end of a queue
+		'''
+		for node in nodes:
+			queue[node] 	= self._rank
+			self._rank 		+=1
+
+	def row(self, node):
+		''' All relations of a node that are not "different" {other node: code}
+		'''
+		if node not in self._rows:
+			self._rows[node] 	= self.matrix.row(node)
+		return self._rows[node]
+
+	def isolate(self, node):
+		''' Make a node different from all other nodes (in the matrix and in the adjacency lists)
+		'''
+		for other in self.row(node):
+			if other in self._rows:
+				del self._rows[other][node]
+			# Subsets, supersets and pairs of supersets of the neighbours may change
+			self._subset_info 	. pop(other, None)
+		self._rows[node] 	= {}
+		self._subset_info 	. pop(node, None)
+		self.matrix 		. isolate(node)
+
+	def pop_component(self, queue, codes, matching_code=None):
+		''' Remove the first node of the queue and all nodes of the queue connected to it (breadth first) and return them as a set.
+			Nodes of a level are visited in the order of the queue. The kinds of relations used for connecting nodes are added to matching_code.
+		'''
+		seed 				= next(iter(queue))
+		del queue[seed]
+		interrelated 		= set( [seed] )
+		interrelated_new 	= set( [seed] )
+		while len(interrelated_new)>0:
+			temp 			= set()
+			# Iterate over all new items
+			for i_node in interrelated_new:
+				related 	= self.row(i_node)
+				# Iterate over all not assigned items related to the new item (in the order of the queue)
+				for i_other_node in sorted( (node for node, code in related.items() if code in codes and node in queue), key=queue.get ):
+					if i_other_node not in temp:
+						temp.add(i_other_node)
+						if matching_code is not None:
+							if related[i_other_node]==RelationMatrix.crossed:
+								matching_code.add("interlaced")
+							elif related[i_other_node] in [RelationMatrix.me_subset, RelationMatrix.it_subset]:
+								matching_code.add("vertical")
+			# Remove items assigned to the component from the queue
+			for node in temp:
+				del queue[node]
+			# Store items assigned as the new related items
+			interrelated_new 	= temp
+			interrelated 		. update(interrelated_new)
+		return interrelated
+
+	def pure_subset_conflict(self, interrelated):
+		''' Find the first pure subset (no subsets and no "crossed" relations) of a component (in the iteration order of the set),
+			which has two supersets in the component that are "different" from each other.
+			Returns the node (None if there is none) and whether two supersets of a pure subset are "crossed" (complete only if there is no conflict).
+		'''
+		crossed 			= False
+		for node in interrelated:
+			pure, supersets, different_pair, crossed_pair 	= self._subsets(node)
+			if not pure:
+				continue
+			# Only supersets within the component are relevant
+			if not all(other in interrelated for other in supersets):
+				different_pair, crossed_pair 				= self._superset_pairs( [other for other in supersets if other in interrelated] )
+			if different_pair:
+				return node, crossed
+			crossed 		= crossed or crossed_pair
+		return None, crossed
+
+	def _subsets(self, node):
+		''' Index of a node: whether it's a pure subset, its supersets and (for pure subsets) whether two supersets are "different" / "crossed"
+		'''
+		if node not in self._subset_info:
+			codes 			= self.row(node).values()
+			pure 			= RelationMatrix.it_subset not in codes and RelationMatrix.crossed not in codes
+			supersets 		= [ other for other, code in self.row(node).items() if code==RelationMatrix.me_subset ]
+			if pure:
+				self._subset_info[node] 	= (pure, supersets) + self._superset_pairs(supersets)
+			else:
+				self._subset_info[node] 	= (pure, supersets, False, False)
+		return self._subset_info[node]
+
+	def _superset_pairs(self, supersets):
+		''' Whether two of the nodes are "different" / "crossed" ("crossed" is complete only if no pair is "different")
+		'''
+		crossed 			= False
+		for index, first in enumerate(supersets):
+			related 		= self.row(first)
+			for second in supersets[index+1:]:
+				code 		= related.get(second, RelationMatrix.different)
+				if code==RelationMatrix.different:
+					return True, crossed
+				elif code==RelationMatrix.crossed:
+					crossed 	= True
+		return False, crossed
@@ -13,86 +13,161 @@
 # limitations under the License.
 
 class Graph:
-	''' Graph defined by matrix with transitive reduction (minimum equivalent graph) function
+	''' Graph defined by a relation matrix (see RelationMatrix) with transitive reduction (minimum equivalent graph) function.
+		The graph is a compact subgraph of the given nodes: internally node i stands for the node self.nodes[i] of the relation matrix,
+		only the relations among the given nodes are read (the matrix is not copied or changed). Results are returned as nodes of the matrix.
 	'''
 
 	# Construct graph
 	def __init__(self, matrix, nodes):
-		self.nodes                      = nodes
-		self.matrix                     = matrix.copy()
+		# Nodes of the matrix (in ascending order, so the internal order of the nodes is the order of the matrix) and their internal index
+		self.nodes                      = sorted(nodes)
+		self.index 						= { node: i for i, node in enumerate(self.nodes) }
 		self.top_nodes                  = set()                     # Filled if required, using top_nodes() function
 		self.top_nodes_sorted 			= []
 		it_subset                       = 1
 		me_subset                       = -1
 		self.main_direction             = it_subset
 		self.main_direction_backwards   = me_subset
+		# Relations among the nodes {other: code} (read once from the matrix, any object with a row(node) function, e.g. RelationMatrix)
+		self.relations 					= [ {} for node in self.nodes ]
+		# Edges between the nodes of the graph (reduced by transitive_reduction)
+		self.successors 				= [ set() for node in self.nodes ]
+		self.predecessors 				= [ set() for node in self.nodes ]
+		self.removed_edges 				= set()
+		self.removed_bits 				= None 						# Filled by the bitset backend of transitive_reduction
+		for i, node in enumerate(self.nodes):
+			for other, code in matrix.row(node).items():
+				if other in self.index:
+					j 					= self.index[other]
+					self.relations[i][j] 	= code
+					if code==self.main_direction:
+						self.successors[i].add(j)
+					elif code==self.main_direction_backwards:
+						self.predecessors[i].add(j)
 
-	def transitive_reduction(self):
-		self.edges_to_remove = []
-		for x in self.nodes:
-			for y in self.nodes:
-				for z in self.nodes:
-					if (x,y) != (y,z) and (x,y) != (x,z):
-						if self.matrix[x][y]==self.main_direction and self.matrix[y][z]==self.main_direction:
-							self.edges_to_remove.append( [x,z] )
+	def get(self, first, second):
+		''' Relation of 'second' from the perspective of 'first' (0 if the edge has been removed by the transitive reduction or a node is not in the graph)
+		'''
+		if first not in self.index or second not in self.index:
+			return 0
+		i, j 							= self.index[first], self.index[second]
+		if (i, j) in self.removed_edges:
+			return 0
+		if self.removed_bits is not None and self.removed_bits[i]>>j & 1:
+			return 0
+		return self.relations[i].get(j, 0)
+
+	def transitive_reduction(self, backend="sets"):
+		''' Remove the edges bridging a path of two edges (for a transitive relation: transitive reduction).
+			Backends: "sets" (successor sets, fast for sparse graphs), "bitset" (successor sets as integer bitsets, fast for dense graphs). Both give the same graph.
+		'''
+		if backend=="bitset":
+			self.transitive_reduction_bitset()
+			return
+		# Pairs connected by a path of two edges (x -> y -> z) in the unreduced graph (internal indices)
+		self.edges_to_remove = set()
+		for x in range(len(self.nodes)):
+			if len(self.successors[x])>0:
+				two_steps 		= set().union( *[ self.successors[y] for y in self.successors[x] ] )
+				self.edges_to_remove.update( (x,z) for z in two_steps )
 
 		for edge in self.edges_to_remove:
-			self.matrix[edge[0]][edge[1]]=0
-			self.matrix[edge[1]][edge[0]]=0
+			self.successors[edge[0]].discard(edge[1])
+			self.successors[edge[1]].discard(edge[0])
+			self.predecessors[edge[0]].discard(edge[1])
+			self.predecessors[edge[1]].discard(edge[0])
+			self.removed_edges.add( (edge[0],edge[1]) )
+			self.removed_edges.add( (edge[1],edge[0]) )
+
+	def transitive_reduction_bitset(self):
+		''' Transitive reduction with bitsets: bit i of an integer stands for the node i of the graph.
+			The pairs to be removed are only kept as bitsets (removed_bits), edges_to_remove is not filled.
+		'''
+		successor_bits 						= [ self._to_bits(successors) for successors in self.successors ]
+		predecessor_bits 					= [ self._to_bits(predecessors) for predecessors in self.predecessors ]
+		# Per node: nodes reachable by two edges (forward: x -> y -> z, backward: z <- y <- x)
+		two_steps 							= []
+		two_steps_backward 					= []
+		for i in range(len(self.nodes)):
+			bits 							= 0
+			for other in self.successors[i]:
+				bits 						|= successor_bits[other]
+			two_steps 						. append(bits)
+			bits 							= 0
+			for other in self.predecessors[i]:
+				bits 						|= predecessor_bits[other]
+			two_steps_backward 				. append(bits)
+		# Pairs removed in both directions
+		self.removed_bits 					= [ forward | backward for forward, backward in zip(two_steps, two_steps_backward) ]
+		for i in range(len(self.nodes)):
+			self.successors[i] 				= self._from_bits( successor_bits[i] & ~self.removed_bits[i] )
+			self.predecessors[i] 			= self._from_bits( predecessor_bits[i] & ~self.removed_bits[i] )
+
+	def _to_bits(self, nodes):
+		bits 								= 0
+		for node in nodes:
+			bits 							|= 1 << node
+		return bits
+
+	def _from_bits(self, bits):
+		nodes 								= set()
+		while bits:
+			lowest 							= bits & -bits
+			nodes 							. add( lowest.bit_length()-1 )
+			bits 							^= lowest
+		return nodes
 
 	def set_top_nodes(self):
-		for node in self.nodes:
-			if self.main_direction_backwards not in self.matrix[node]:
+		''' Nodes without predecessors (as nodes of the matrix)
+		'''
+		for i, node in enumerate(self.nodes):
+			if len(self.predecessors[i])==0:
 				self.top_nodes.add(node)
 
-	def get_single_strands_rec(self, completed_strands, current_strand, current_node):
-		# If the new node has multiple predecessors
-		if self.matrix[current_node].count(self.main_direction_backwards)>1:
-			# Add previous strand to completed
-			if len(current_strand)>0:
-				completed_strands.append(current_strand)
-			# Current node is a single strand, because it's a forking node
-			completed_strands.append([current_node])
-			# Look at each fork
-			for next_node in range( len(self.matrix[current_node]) ):
-				if self.matrix[current_node][next_node]==self.main_direction:
-					# Start new strand for the fork
-					self.get_single_strands_rec( completed_strands, [], next_node )
-		# Strand splits into multiple substrands
-		elif self.matrix[current_node].count(self.main_direction)>1:
-			# Add previous strand to completed
-			if len(current_strand)>0:
-				completed_strands.append(current_strand)
-			# Current node is a single strand, because it's a forking node
-			completed_strands.append([current_node])
-			# Look at each fork
-			for next_node in range( len(self.matrix[current_node]) ):
-				if self.matrix[current_node][next_node]==self.main_direction:
-					# Start new strand for the fork
-					self.get_single_strands_rec( completed_strands, [], next_node )
-		# Strand continues with exactly one member
-		elif self.matrix[current_node].count(self.main_direction)==1:
-			# Add current node to the existing strand
-			self.get_single_strands_rec( completed_strands, current_strand+[current_node], self.matrix[current_node].index(self.main_direction) )
-		# Final member of the strand
-		else:
-			# Append completed strand to completed_strands
-			completed_strands.append(current_strand+[current_node])
-
 	def get_single_strands(self):
+		''' Split the (reduced) graph into single stranded parts: chains without forks, forking and merging nodes are strands of their own.
+			Returns each strand once as a tuple of nodes of the matrix (in the order of a depth-first traversal from the top nodes).
+		'''
 		# Compute top nodes
 		self.set_top_nodes()
 		# Create list for the completed strands
-		self.completed_strands              = []
-		# Start a strand at each top node
-		for node in self.top_nodes:
-			self.get_single_strands_rec(self.completed_strands,[],node)
-		# Uniquefy
-		self.completed_strands = [str(x) for x in self.completed_strands]
-		self.completed_strands = set(self.completed_strands)
-		self.completed_strands = [eval(x) for x in self.completed_strands]
-		# Return the result
-		return self.completed_strands.copy()
+		self.completed_strands 				= []
+		completed 							= set()
+		# Nodes at which strands have been started (each is followed only once, otherwise the number of paths through the graph would be followed)
+		strand_starts 						= set()
+		# Nodes at which new strands start (last in, first out)
+		to_be_started 						= sorted( [self.index[node] for node in self.top_nodes], reverse=True )
+		while len(to_be_started)>0:
+			current_node 					= to_be_started.pop()
+			if current_node in strand_starts:
+				continue
+			strand_starts 					. add(current_node)
+			current_strand 					= []
+			# Follow the strand
+			while True:
+				# If the node has multiple predecessors or the strand splits into multiple substrands
+				if len(self.predecessors[current_node])>1 or len(self.successors[current_node])>1:
+					# Add previous strand to completed, the current node is a single strand, because it's a forking node
+					for strand in [current_strand, [current_node]]:
+						if len(strand)>0 and tuple(strand) not in completed:
+							completed 					. add(tuple(strand))
+							self.completed_strands 		. append(tuple(strand))
+					# Start new strands for the forks
+					to_be_started 			. extend( sorted(self.successors[current_node], reverse=True) )
+					break
+				current_strand 				. append(current_node)
+				# Strand continues with exactly one member
+				if len(self.successors[current_node])==1:
+					current_node 			= min(self.successors[current_node])
+				# Final member of the strand
+				else:
+					if tuple(current_strand) not in completed:
+						completed 					. add(tuple(current_strand))
+						self.completed_strands 		. append(tuple(current_strand))
+					break
+		# Return the result (as nodes of the matrix)
+		return [ tuple(self.nodes[i] for i in strand) for strand in self.completed_strands ]
 
 	def get_node_positions_rec(self, node_positions, frame_coordinates, current_node):
 		''' Iterate from given node to the bottom of the tree
@@ -107,19 +182,18 @@ class Graph:
 
 		# Continue with next node
 		# If strand has successors
-		if self.matrix[current_node].count(self.main_direction)>0:
+		if len(self.successors[current_node])>0:
 			# Next level lower than last level
 			frame_coordinates["current_bottom"] 		-=10
 			frame_coordinates["current_right"] 			= frame_coordinates["outer_right"]
 			current_right 								= frame_coordinates["current_right"]
 			current_bottom 								= frame_coordinates["current_bottom"]
 			# Look at each fork
-			for next_node in range( len(self.matrix[current_node]) ):
-				if self.matrix[current_node][next_node]==self.main_direction:
-					# Start new strand for the fork
-					self.get_node_positions_rec( node_positions, frame_coordinates, next_node )
-					# Next level further right than last level
-					frame_coordinates["current_right"] 	+=10
+			for next_node in sorted(self.successors[current_node]):
+				# Start new strand for the fork
+				self.get_node_positions_rec( node_positions, frame_coordinates, next_node )
+				# Next level further right than last level
+				frame_coordinates["current_right"] 	+=10
 			frame_coordinates["current_right"] 			-=10
 			frame_coordinates["outer_right"] 			= frame_coordinates["current_right"]
 		# Final member of the strand
@@ -137,24 +211,25 @@ class Graph:
 		for node in self.top_nodes_sorted:
 			self.frame_coordinates["current_bottom"]= self.frame_coordinates["initial_bottom"]
 			self.frame_coordinates["current_right"] = self.frame_coordinates["outer_right"]
-			self.get_node_positions_rec(self.node_positions, self.frame_coordinates, node)
+			self.get_node_positions_rec(self.node_positions, self.frame_coordinates, self.index[node])
 			self.frame_coordinates["outer_right"] 	+=10
 			self.frame_coordinates["current_right"] = self.frame_coordinates["outer_right"]
 			if self.frame_coordinates["initial_bottom"]==0:
 				self.frame_coordinates["initial_bottom"]= -1
 			else:
 				self.frame_coordinates["initial_bottom"]= 0
-		# Return the result
-		return self.node_positions.copy()
+		# Return the result (as nodes of the matrix)
+		return { self.nodes[i]: position for i, position in self.node_positions.items() }
 
 # # Script for testing Graph class
-# a = [
-# 	  ['identical', 'crossed', 1, 'crossed', 1], 
-# 	  ['crossed', 'identical', 'crossed', 1, 1], 
-# 	  [-1, 'crossed', 'identical', 'different', 1], 
-# 	  ['crossed', -1, 'different', 'identical', 'different'], 
-# 	  [-1, -1, -1, 'different', 'identical']
-#   ]
+# from persons.support_functions.relation_matrix import RelationMatrix
+# a = RelationMatrix()
+# crossed = RelationMatrix.crossed
+# a.add_node()
+# a.add_node({0: crossed})
+# a.add_node({0: -1, 1: crossed})
+# a.add_node({0: crossed, 1: -1})
+# a.add_node({0: -1, 1: -1, 2: -1})
 
 # G = Graph(a, [0,1,2,3,4])
 
@@ -163,9 +238,9 @@ class Graph:
 # G.top_nodes
 # import pprint
 # print("Removed edges:")
-# pprint.pprint(G.edges_to_remove)
+# pprint.pprint([(G.nodes[x], G.nodes[z]) for x, z in G.edges_to_remove])
 # print("Remaining edges:")
-# pprint.pprint(G.matrix)
+# pprint.pprint({G.nodes[i]: [G.nodes[j] for j in successors] for i, successors in enumerate(G.successors)})
 # print("Top nodes:")
 # G.set_top_nodes()
 # pprint.pprint(G.top_nodes)
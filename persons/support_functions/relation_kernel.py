@@ -0,0 +1,122 @@
+# Copyright 2017 Sascha Schweitzer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#    http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+from bisect import bisect_left
+
+from persons.support_functions.relation_matrix import RelationMatrix
+
+# Maximum number of entries of the intermediate arrays (new forenames x forenames x positions) of one vectorized pass
+kernel_chunk_size 		= 2**22
+# Minimum number of forenames of a surname for the vectorized comparison (smaller surnames are faster without numpy)
+kernel_minimum_size 	= 64
+
+def numpy_available():
+	''' Returns if numpy can be imported (numpy is only required for the numpy relation backend)
+	'''
+	try:
+		import numpy
+	except ImportError:
+		return False
+	return True
+
+def vectorized_relations(signatures, first_new):
+	''' Relations of the forenames signatures[first_new:] to the previous forenames of the list, computed with numpy.
+		Only valid for the order-respecting comparison with absolute positions (no middle name rule), see Persons._compare_signatures:
+		names with different initials at a common position are "different", otherwise the tokens of the new name are searched in the
+		other name in order (as by _compare_signatures, for all pairs of a chunk at once).
+		Returns per new forename the relations that are not "different" {index: code} (codes of RelationMatrix) and
+		the indices of the previous forenames that have to be compared by Persons._compare_signatures (only names of the same length without any difference, i.e. never for distinct names).
+	'''
+	import numpy
+
+	results 			= [ ({}, []) for index in range(first_new, len(signatures)) ]
+	# Names with different first initials are "different"
+	groups 				= collections.OrderedDict()
+	for index, signature in enumerate(signatures):
+		groups 			. setdefault(signature.initials[0], []) . append(index)
+
+	for group in groups.values():
+		if group[-1]<first_new:
+			continue
+		size 			= len(group)
+		width 			= max( signatures[index].length for index in group )
+		# Padded arrays of the token IDs of the forenames of the group (rows: forenames, columns: positions; one numbering of tokens and initials, see TokenTable)
+		tokens 			= numpy.full( (size, width), -1, dtype=numpy.int64 )
+		initials 		= numpy.full( (size, width), -2, dtype=numpy.int64 )
+		lengths 		= numpy.zeros( size, dtype=numpy.int64 )
+		for row, index in enumerate(group):
+			signature 						= signatures[index]
+			tokens[row, :signature.length] 	= signature.tokens
+			initials[row, :signature.length] 	= signature.initials
+			lengths[row] 					= signature.length
+		positions 		= numpy.arange(width)
+
+		# New forenames of the group, compared to the previous forenames of the group in chunks
+		first_row 		= bisect_left(group, first_new)
+		step 			= max( 1, kernel_chunk_size // (size*width) )
+		for begin in range(first_row, size, step):
+			end 			= min(size, begin+step)
+			# Positions of the initials (absolute positions): pairs with the same initials at all common positions
+			common 			= (positions < lengths[begin:end, None, None]) & (positions < lengths[None, :end, None])
+			consistent 		= ~( common & (initials[begin:end, None, :]!=initials[None, :end, :]) ).any(2)
+			consistent 		&= numpy.arange(end) < numpy.arange(begin, end)[:, None]
+			me, it 			= numpy.nonzero(consistent)
+			if len(me)==0:
+				continue
+			me 				+= begin
+			me_lengths 		= lengths[me]
+			it_lengths 		= lengths[it]
+			# Kind of match of token p of me and token q of it (pairs x p x q): 1 "equal", 2 "me_initial", 3 "it_initial", 0 none
+			me_tokens 		= tokens[me, :, None]
+			it_tokens 		= tokens[it, None, :]
+			kinds 			= numpy.select(
+								[ me_tokens==it_tokens, me_tokens==initials[it, None, :], initials[me, :, None]==it_tokens ],
+								[ 1, 2, 3 ], default=0 ) . astype(numpy.int8)
+			kinds[ numpy.broadcast_to( positions >= it_lengths[:, None, None], kinds.shape ) ] 	= 0
+			# Search each token of me in the remaining tokens of it (first match after the last one found)
+			last_found 		= numpy.zeros( len(me), dtype=numpy.int64 )
+			found_count 	= numpy.zeros( len(me), dtype=numpy.int64 )
+			unknown 		= numpy.zeros( len(me), dtype=bool )
+			me_initial 		= numpy.zeros( len(me), dtype=bool )
+			it_initial 		= numpy.zeros( len(me), dtype=bool )
+			for position in range(width):
+				active 		= position < me_lengths
+				candidates 	= (kinds[:, position, :] > 0) & (positions >= last_found[:, None])
+				found 		= active & candidates.any(1)
+				first 		= candidates.argmax(1)
+				kind 		= kinds[numpy.arange(len(me)), position, first]
+				last_found 	= numpy.where(found, first+1, last_found)
+				found_count += found
+				unknown 	|= active & ~found
+				me_initial 	|= found & (kind==2)
+				it_initial 	|= found & (kind==3)
+
+			longer 			= me_lengths > it_lengths
+			shorter 		= me_lengths < it_lengths
+			# It shorter: it has to be found completely, me shorter or same length: me has to be found completely
+			different 		= ( longer & (found_count < it_lengths) ) | ( ~longer & unknown )
+			codes 			= numpy.select(
+								[ different, longer & me_initial, longer, shorter & it_initial, shorter, me_initial & it_initial, me_initial, it_initial ],
+								[ RelationMatrix.different, RelationMatrix.crossed, RelationMatrix.it_subset, RelationMatrix.crossed, RelationMatrix.me_subset,
+								  RelationMatrix.crossed, RelationMatrix.me_subset, RelationMatrix.it_subset ],
+								default=RelationMatrix.different )
+			scalar 			= ~different & ~longer & ~shorter & ~me_initial & ~it_initial
+
+			# Relations of the pairs that are not "different"
+			for index in numpy.flatnonzero(codes):
+				results[ group[me[index]]-first_new ][0][ group[it[index]] ] 	= int( codes[index] )
+			for index in numpy.flatnonzero(scalar):
+				results[ group[me[index]]-first_new ][1] . append( group[it[index]] )
+	return results
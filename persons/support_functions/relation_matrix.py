@@ -0,0 +1,128 @@
+# Copyright 2017 Sascha Schweitzer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#    http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from array import array
+from bisect import bisect_left
+
+class RelationMatrix:
+	''' Relations between the nodes of a surname block, coded as small integers.
+		Only the upper triangle is stored, the lower triangle is derived by flipping the perspective.
+		"different" (by far the most common relation) is not stored at all: each column of the upper
+		triangle holds the sorted indices of the related nodes and their codes in compact arrays.
+	'''
+
+	# Coding of the relations (from the perspective of the row node)
+	different 				= 0
+	it_subset 				= 1
+	me_subset 				= -1
+	crossed 				= 2
+	identical 				= 3
+
+	# Mapping for converting the perspective
+	_flipped 				= {different: different, it_subset: me_subset, me_subset: it_subset, crossed: crossed, identical: identical}
+
+	def __init__(self):
+		self.size 			= 0
+		# Per node: nodes with lower index that are related to it (sorted), and the codes from their perspective
+		self._column_nodes 	= []
+		self._column_codes 	= []
+		# Per node: nodes with higher index that are related to it (sorted)
+		self._row_nodes 	= []
+
+	def __len__(self):
+		return self.size
+
+	def add_node(self, relations=None):
+		''' Add a node, given its relations to existing nodes {node: code} (from the perspective of the new node).
+			Returns the index of the new node.
+		'''
+		new_node 			= self.size
+		column_nodes 		= array('i')
+		column_codes 		= array('b')
+		if relations is not None:
+			for node in sorted(relations):
+				if relations[node]!=self.different:
+					column_nodes 			. append(node)
+					column_codes 			. append(self._flipped[relations[node]])
+					self._row_nodes[node] 	. append(new_node)
+		self._column_nodes 	. append(column_nodes)
+		self._column_codes 	. append(column_codes)
+		self._row_nodes 	. append(array('i'))
+		self.size 			+=1
+		return new_node
+
+	def get(self, first, second):
+		''' Relation of 'second' from the perspective of 'first'
+		'''
+		if first<second:
+			column_nodes 	= self._column_nodes[second]
+			index 			= bisect_left(column_nodes, first)
+			if index<len(column_nodes) and column_nodes[index]==first:
+				return self._column_codes[second][index]
+			return self.different
+		elif first>second:
+			return self._flipped[ self.get(second, first) ]
+		return self.identical
+
+	def set(self, first, second, code):
+		''' Set relation of 'second' from the perspective of 'first' (and the flipped relation vice versa)
+		'''
+		if first>second:
+			first, second 	= second, first
+			code 			= self._flipped[code]
+		elif first==second:
+			return
+		column_nodes 		= self._column_nodes[second]
+		index 				= bisect_left(column_nodes, first)
+		exists 				= index<len(column_nodes) and column_nodes[index]==first
+		row_nodes 			= self._row_nodes[first]
+		if code==self.different:
+			if exists:
+				del column_nodes[index]
+				del self._column_codes[second][index]
+				del row_nodes[bisect_left(row_nodes, second)]
+		elif exists:
+			self._column_codes[second][index] 	= code
+		else:
+			column_nodes 				. insert(index, first)
+			self._column_codes[second] 	. insert(index, code)
+			row_nodes 					. insert(bisect_left(row_nodes, second), second)
+
+	def row(self, node):
+		''' All relations of a node that are not "different" {other node: code} (from the perspective of 'node')
+		'''
+		flipped 			= self._flipped
+		relations 			= { other: flipped[code] for other, code in zip(self._column_nodes[node], self._column_codes[node]) }
+		for other in self._row_nodes[node]:
+			relations[other] 	= self.get(node, other)
+		return relations
+
+	def isolate(self, node):
+		''' Make a node different from all other nodes
+		'''
+		for other in self._row_nodes[node]:
+			index 			= bisect_left(self._column_nodes[other], node)
+			del self._column_nodes[other][index]
+			del self._column_codes[other][index]
+		for other in self._column_nodes[node]:
+			row_nodes 		= self._row_nodes[other]
+			del row_nodes[bisect_left(row_nodes, node)]
+		self._column_nodes[node] 	= array('i')
+		self._column_codes[node] 	= array('b')
+		self._row_nodes[node] 		= array('i')
+
+	def to_lists(self):
+		''' Dense list of lists representation (e.g. for debugging)
+		'''
+		return [ [ self.get(first, second) for second in range(self.size) ] for first in range(self.size) ]
@@ -14,27 +14,179 @@
 
 # -*- coding: utf-8 -*-
 import re
+import functools
 
-def remove_particles(string):
+# Noble particles and suffixes (for last names)
+default_particles = ["van", "von", "de", "d", "di", "dei", "of", "zu", "zur", "dos", "af", "der", "graf"]
+
+@functools.lru_cache(maxsize=32)
+def _particle_pattern(particles):
+	''' Single compiled pattern matching any of the given particles as a whole word.
+	'''
+
+	# Longer particles first (relevant for particles made of several words, e.g. "de la" and "de")
+	alternatives = sorted(set(particles), key=lambda particle: (-len(particle), particle))
+	return re.compile(r"\b(?:%s)\b" % "|".join(re.escape(particle) for particle in alternatives))
+
+def remove_particles(string, particles=None):
 	''' Remove noble particles and suffixes (for last names).
 		Only remove, if the name doesn't become empty.
+		particles: list of particles to be removed (default_particles if None)
 	'''
 
-	if len(string.split(" "))>1:
-		# Particles to be removed
-		particles 	= ["van", "von", "de", "d", "di", "dei", "of", "zu", "zur", "dos", "af", "der", "graf"]
-		
-		transformed = string
-		for particle in particles:
-			transformed 	= re.sub(r"\b%s\b" % particle, '', transformed)
+	if particles is None:
+		particles = default_particles
+
+	if " " in string and len(particles)>0:
+		# Remove all particles in a single pass
+		transformed = _particle_pattern(tuple(particles)).sub('', string)
 
 		transformed = transformed.strip()
 
-		if len(transformed.split(" "))>0 and transformed!="":
+		if transformed!="":
 			return transformed
 		return string
 	return string
 
+def remove_particles_many(strings, particles=None):
+	''' Remove particles from a column of last names. Each distinct name is processed only once.
+	'''
+
+	transformed = {}
+	result 		= []
+	for string in strings:
+		if string not in transformed:
+			transformed[string] = remove_particles(string, particles)
+		result.append(transformed[string])
+	return result
+
+# Evil characters and their replacements (applied after converting to lower case)
+invalid_characters = 	{
+	'Š' : 'S', 
+	'š' : 's', 
+	'Ð' : 'Dj', 
+	'd' : 'd', 
+	'Ž' : 'Z', 
+	'ž' : 'z', 
+	'C' : 'C', 
+	'c' : 'c', 
+	'C' : 'C', 
+	'c' : 'c', 
+	'À' : 'A', 
+	'Á' : 'A', 
+	'Â' : 'A', 
+	'Ã' : 'A', 
+	'Ä' : 'A', 
+	'Å' : 'A', 
+	'Æ' : 'A', 
+	'Ç' : 'C', 
+	'È' : 'E', 
+	'É' : 'E', 
+	'Ê' : 'E', 
+	'Ë' : 'E', 
+	'Ì' : 'I', 
+	'Í' : 'I', 
+	'Î' : 'I', 
+	'Ï' : 'I', 
+	'Ñ' : 'N', 
+	'Ò' : 'O', 
+	'Ó' : 'O', 
+	'Ô' : 'O', 
+	'Õ' : 'O', 
+	'Ö' : 'O', 
+	'Ø' : 'O', 
+	'Ù' : 'U', 
+	'Ú' : 'U', 
+	'Û' : 'U', 
+	'Ü' : 'U', 
+	'Ý' : 'Y', 
+	'Þ' : 'B', 
+	'ß' : 'Ss', 
+	'à' : 'a', 
+	'á' : 'a', 
+	'â' : 'a', 
+	'ã' : 'a', 
+	'ä' : 'a', 
+	'å' : 'a', 
+	'æ' : 'a', 
+	'ç' : 'c', 
+	'è' : 'e', 
+	'é' : 'e', 
+	'ê' : 'e', 
+	'ë' : 'e', 
+	'ì' : 'i', 
+	'í' : 'i', 
+	'î' : 'i', 
+	'ï' : 'i', 
+	'ð' : 'o', 
+	'ñ' : 'n', 
+	'ò' : 'o', 
+	'ó' : 'o', 
+	'ô' : 'o', 
+	'õ' : 'o', 
+	'ö' : 'o', 
+	'ø' : 'o', 
+	'ù' : 'u', 
+	'ú' : 'u', 
+	'û' : 'u', 
+	'ü' : 'u', 
+	'ý' : 'y', 
+	'ý' : 'y', 
+	'þ' : 'b', 
+	'ÿ' : 'y', 
+	'R' : 'R', 
+	'r' : 'r', 
+	"`"  :  "", 
+	"´"  :  "", 
+	"„"  :  "", 
+	"`"  :  "", 
+	"´"  :  "", 
+	"“"  :  "", 
+	"”"  :  "", 
+	"´"  :  "", 
+	"&acirc;€™"  :  "", 
+	"{"  :  "", 
+	"~"  :  "", 
+	"–"  :  " ", 
+	"’"  :  "", 
+	"\""  :  "", 
+	"'"  :  "", 
+	"-"  :  " ", 
+	"."  :  " ", 
+	":" : " ", 
+	"("  :  "", 
+	")"  :  "", 
+	"{"  : "", 
+	"}" : "", 
+	"[" : "", 
+	"]" : "", 
+	"/" : " ", 
+	"\\" : " ", 
+	"|" : " ", 
+	":" : " ", 
+	"*" : " ", 
+	"&" : " and "
+				}
+
+# Multiple succeeding white space
+_whitespace = re.compile(r'\s+')
+
+# Maximum number of distinct strings memorized by normalize_cached
+normalize_cache_size = 2**18
+
+class _TranslationTable(dict):
+	''' Table for str.translate, built once from invalid_characters.
+		Digits are looked up on first occurrence and memorized.
+	'''
+
+	def __missing__(self, code):
+		# Remove numbers, keep everything else
+		value = None if chr(code).isdigit() else code
+		self[code] = value
+		return value
+
+_translation_table = _TranslationTable( (ord(key), value) for key, value in invalid_characters.items() if len(key)==1 )
+
 def normalize(string):
 	''' Remove evil characters from names and replace with another character.
 	'''
@@ -42,119 +194,22 @@ def normalize(string):
 	if string==None:
 		return ""
 	else:
-		# To lower case:
-		string = string.lower()
-
-		invalid = 	{
-					'Š' : 'S', 
-					'š' : 's', 
-					'Ð' : 'Dj', 
-					'd' : 'd', 
-					'Ž' : 'Z', 
-					'ž' : 'z', 
-					'C' : 'C', 
-					'c' : 'c', 
-					'C' : 'C', 
-					'c' : 'c', 
-					'À' : 'A', 
-					'Á' : 'A', 
-					'Â' : 'A', 
-					'Ã' : 'A', 
-					'Ä' : 'A', 
-					'Å' : 'A', 
-					'Æ' : 'A', 
-					'Ç' : 'C', 
-					'È' : 'E', 
-					'É' : 'E', 
-					'Ê' : 'E', 
-					'Ë' : 'E', 
-					'Ì' : 'I', 
-					'Í' : 'I', 
-					'Î' : 'I', 
-					'Ï' : 'I', 
-					'Ñ' : 'N', 
-					'Ò' : 'O', 
-					'Ó' : 'O', 
-					'Ô' : 'O', 
-					'Õ' : 'O', 
-					'Ö' : 'O', 
-					'Ø' : 'O', 
-					'Ù' : 'U', 
-					'Ú' : 'U', 
-					'Û' : 'U', 
-					'Ü' : 'U', 
-					'Ý' : 'Y', 
-					'Þ' : 'B', 
-					'ß' : 'Ss', 
-					'à' : 'a', 
-					'á' : 'a', 
-					'â' : 'a', 
-					'ã' : 'a', 
-					'ä' : 'a', 
-					'å' : 'a', 
-					'æ' : 'a', 
-					'ç' : 'c', 
-					'è' : 'e', 
-					'é' : 'e', 
-					'ê' : 'e', 
-					'ë' : 'e', 
-					'ì' : 'i', 
-					'í' : 'i', 
-					'î' : 'i', 
-					'ï' : 'i', 
-					'ð' : 'o', 
-					'ñ' : 'n', 
-					'ò' : 'o', 
-					'ó' : 'o', 
-					'ô' : 'o', 
-					'õ' : 'o', 
-					'ö' : 'o', 
-					'ø' : 'o', 
-					'ù' : 'u', 
-					'ú' : 'u', 
-					'û' : 'u', 
-					'ü' : 'u', 
-					'ý' : 'y', 
-					'ý' : 'y', 
-					'þ' : 'b', 
-					'ÿ' : 'y', 
-					'R' : 'R', 
-					'r' : 'r', 
-					"`"  :  "", 
-					"´"  :  "", 
-					"„"  :  "", 
-					"`"  :  "", 
-					"´"  :  "", 
-					"“"  :  "", 
-					"”"  :  "", 
-					"´"  :  "", 
-					"&acirc;€™"  :  "", 
-					"{"  :  "", 
-					"~"  :  "", 
-					"–"  :  " ", 
-					"’"  :  "", 
-					"\""  :  "", 
-					"'"  :  "", 
-					"-"  :  " ", 
-					"."  :  " ", 
-					":" : " ", 
-					"("  :  "", 
-					")"  :  "", 
-					"{"  : "", 
-					"}" : "", 
-					"[" : "", 
-					"]" : "", 
-					"/" : " ", 
-					"\\" : " ", 
-					"|" : " ", 
-					":" : " ", 
-					"*" : " ", 
-					"&" : " and "
-				}
-
-		# Remove numbers and replace invalid expressions
-		string = ''.join( (c if c not in invalid else invalid[c]) for c in string if not c.isdigit())
+		# To lower case, remove numbers and replace invalid expressions
+		string = string.lower().translate(_translation_table)
 
 		# Trim inner part of the string by replacing multiple succeeding white space by only one
-		return re.sub('\s+', ' ', string).strip()
+		return _whitespace.sub(' ', string).strip()
+
+@functools.lru_cache(maxsize=normalize_cache_size)
+def normalize_cached(string):
+	''' Memorized version of normalize() for heavily repeated names.
+		Hit/miss statistics are available from normalize_cached.cache_info().
+	'''
+
+	return normalize(string)
+
+def normalize_many(strings):
+	''' Normalize a column of names (any iterable, e.g. a list or a pandas Series).
+	'''
 
+	return [normalize_cached(string) for string in strings]
@@ -0,0 +1,48 @@
+# Copyright 2017 Sascha Schweitzer
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#    http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+class TokenTable:
+	''' Integer IDs of strings (interning): equal strings get the same ID, IDs are assigned in the order of first appearance.
+		For each string the ID of its initial (first character) and whether it is an initial itself (one character) are kept,
+		so names can be compared as tuples of IDs. IDs are only valid within one table (i.e. one process).
+	'''
+
+	def __init__(self):
+		self.ids 			= {}
+		self.strings 		= []
+		self.initial 		= [] 		# ID of the initial of each string
+		self.single 		= [] 		# String is an initial (one character)
+
+	def __len__(self):
+		return len(self.strings)
+
+	def intern(self, string):
+		''' ID of a string (a new ID, if the string has not been seen before)
+		'''
+		string_id 			= self.ids.get(string)
+		if string_id is None:
+			string_id 		= len(self.strings)
+			self.ids[string] 	= string_id
+			self.strings 	. append(string)
+			self.initial 	. append(string_id)
+			self.single 	. append(len(string)==1)
+			# Initials (and the empty string) are their own initial
+			if len(string)>1:
+				self.initial[string_id] 	= self.intern(string[0:1])
+		return string_id
+
+	def string(self, string_id):
+		''' String of an ID
+		'''
+		return self.strings[string_id]
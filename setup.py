@@ -13,6 +13,8 @@ setup(name='persons',
       ],
       extras_require = {
               'xlsx support':  ["pandas"],
-              'pandas support':  ["pandas"]
+              'pandas support':  ["pandas"],
+              'numpy support':  ["numpy"],
+              'parquet support':  ["pyarrow"]
           },
       zip_safe=False)